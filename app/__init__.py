@@ -1,4 +1,8 @@
-from flask import Flask
+import gc
+import multiprocessing
+import os
+
+from flask import Flask, g
 from flask_cors import CORS
 
 def get_app():
@@ -6,8 +10,52 @@ def get_app():
   app.config.from_object(__name__)
   CORS(app, resources={r'/*': {'origins': '*'}})
 
+  # Processos de pools do multiprocessing (ex.: replay do pm4py) importam o pacote, mas não
+  # atendem requisições: não carregam os dados nem observam o log
+  servidor = multiprocessing.parent_process() is None
+
+  # Modo preload (gunicorn.conf.py): os dados são carregados uma vez no master e herdados pelos workers
+  if servidor and os.environ.get('PRECARREGAR_DADOS') == '1':
+    precarregar_dados()
+
+  # Cada requisição usa uma única versão do log, mesmo que ele seja recarregado durante ela
+  @app.before_request
+  def fixar_versao_dos_dados():
+    from app.utils.registro import fixar_versao
+
+    g.token_versao = fixar_versao()
+
+  @app.teardown_request
+  def liberar_versao_dos_dados(erro=None):
+    from app.utils.registro import liberar_versao
+
+    token = g.pop('token_versao', None)
+    if token is not None:
+      liberar_versao(token)
+
+  # RECARREGAR_LOG_INTERVALO=<segundos>: recarrega o log quando data/logfinal.csv muda
+  intervalo = float(os.environ.get('RECARREGAR_LOG_INTERVALO', '0'))
+  if servidor and intervalo > 0:
+    from app.utils.registro import iniciar_observador
+
+    iniciar_observador(intervalo)
+
   return app
 
+def precarregar_dados():
+  from app.utils.registro import carregar_tudo
+  from app.controllers.process_v2 import aquecer_tabelas
+  from app.utils.process_mining import gerar_imagem_rede_petri
+
+  carregar_tudo()
+  aquecer_tabelas()
+  gerar_imagem_rede_petri()
+
+  # Os objetos já carregados deixam de ser visitados pelo coletor de lixo, que de outra
+  # forma escreveria em suas páginas e as duplicaria em cada worker após o fork
+  gc.collect()
+  gc.freeze()
+
 server = get_app()
 
 from app import routes
@@ -1,10 +1,34 @@
-from flask import send_file
-import json
+from flask import send_file, request
+import base64
+import hmac
+import io
+import os
 
-from app.utils.new_image_generate import visualizar_disciplinas_por_metrica, analisar_turma, consolidar_metricas
-from app.utils.process_mining import executar_replay
+from app.utils.cache import CacheCalculo, CacheRender, gerar_chave
+from app.utils.new_image_generate import visualizar_disciplinas_por_metrica, analisar_turma, consolidar_registros, calcular_metricas, TIPOS_METRICA
+from app.utils.process_mining import executar_replay, gerar_imagem_rede_petri
+from app.utils.sobrevivencia import curvas_sobrevivencia
+from app.utils.caminho_critico import atrasos_por_pre_requisito
+from app.utils.registro import obter_impressao_log, obter_impressao_rede, obter_versao_log, obter_indice, executar_na_versao, recarregar_em_segundo_plano, obter_impressao_arquivo_log, registrar_ao_recarregar
+from app.utils import tarefas
 
-def generate_image(selecao, tipo_visualizacao):
+# Cache das imagens de métricas por disciplina (memória + disco)
+cache_imagens = CacheRender('app/images/cache')
+
+# Versão do desenho das imagens, parte das chaves do cache em disco: incrementar sempre que
+# a renderização mudar, para que imagens (e ETags) geradas pelo código anterior não sejam servidas
+VERSAO_RENDER = 2
+
+# Resultados da rota de tabelas por seleção e versão do log (ver aquecer_tabelas)
+cache_tabelas = CacheCalculo(max_itens=128)
+
+def chave_imagem_metrica(tipo_visualizacao, selecao, sobrepor_atrasos=False):
+  # A imagem depende apenas da métrica, da seleção, da sobreposição de atrasos e do log de eventos
+  if sobrepor_atrasos:
+    return gerar_chave('metrica', VERSAO_RENDER, tipo_visualizacao, selecao, 'atrasos', obter_impressao_log())
+  return gerar_chave('metrica', VERSAO_RENDER, tipo_visualizacao, selecao, obter_impressao_log())
+
+def generate_image(selecao, tipo_visualizacao, sobrepor_atrasos=False):
   if isinstance(selecao, (tuple, list)) and len(selecao) == 2:
     faixa = list(selecao)  # Converte para lista, se necessário
     ano = None
@@ -16,21 +40,29 @@ def generate_image(selecao, tipo_visualizacao):
     ano = int(selecao)
   else:
     raise ValueError("Seleção inválida. Deve ser um ano (int), faixa de anos (tuple/list) ou None (todos os anos).")
-  
-  try:
+
+  chave = chave_imagem_metrica(tipo_visualizacao, faixa or ano, sobrepor_atrasos)
+
+  # Cliente já possui a imagem: responde sem renderizar e sem corpo
+  if request.if_none_match.contains(chave):
+    return '', 304, {'ETag': f'"{chave}"'}
+
+  def renderizar():
+    # Espessura das arestas proporcional ao atraso transmitido por cada pré-requisito
+    atrasos = atrasos_por_pre_requisito(faixa or ano)['arestas'] if sobrepor_atrasos else None
+
     if faixa:
-      image_name = visualizar_disciplinas_por_metrica(faixa, tipo_visualizacao)
+      return visualizar_disciplinas_por_metrica(faixa, tipo_visualizacao, atrasos=atrasos)
     elif ano:
-      image_name = visualizar_disciplinas_por_metrica(ano, tipo_visualizacao)
+      return visualizar_disciplinas_por_metrica(ano, tipo_visualizacao, atrasos=atrasos)
     else:
-      image_name = visualizar_disciplinas_por_metrica(None, tipo_visualizacao)
+      return visualizar_disciplinas_por_metrica(None, tipo_visualizacao, atrasos=atrasos)
 
-    img_path = f'images/{image_name}'
+  # Falhas de renderização ou do cache em disco propagam (500): nunca viram uma resposta 200 com ETag
+  dados = cache_imagens.obter_ou_renderizar(chave, renderizar)
 
-    # Exibir imagem
-    return send_file(img_path, mimetype='image/png')
-  except Exception as e:
-    return str('e')
+  # Exibir imagem
+  return send_file(io.BytesIO(dados), mimetype='image/png', etag=chave, max_age=0)
 
 def controller_tabelas(selecao):
   if isinstance(selecao, (tuple, list)) and len(selecao) == 2:
@@ -45,30 +77,98 @@ def controller_tabelas(selecao):
   else:
     raise ValueError("Seleção inválida. Deve ser um ano (int), faixa de anos (tuple/list) ou None (todos os anos).")
 
-  analise_turma_result = analisar_turma(ano)
+  return calcular_tabelas(faixa, ano)
+
+def calcular_tabelas(faixa, ano):
+  chave = gerar_chave('tabelas', faixa or ano, obter_impressao_log())
+
+  def calcular():
+    return {
+      'analise_turma': analisar_turma(ano),
+      'df_consolidado': consolidar_registros(faixa or ano),
+    }
+
+  return cache_tabelas.obter_ou_calcular(chave, calcular)
+
+def aquecer_tabelas():
+  # Todas as turmas com evento 'Iniciou' e a visão de todas as turmas; faixas entram sob demanda
+  anos = sorted({int(ano) for ano in obter_indice().ano_ingresso if ano >= 0})
+
+  for ano in [None] + anos:
+    calcular_tabelas(None, ano)
+
+# Após recarregar o log, as tabelas da nova versão são calculadas antes de serem pedidas
+registrar_ao_recarregar(aquecer_tabelas)
+
+def controller_sobrevivencia(selecao):
+  if isinstance(selecao, (tuple, list)) and len(selecao) == 2:
+    selecao = list(selecao)
+  elif selecao == "Todos as turmas" or selecao is None:
+    selecao = None
+  elif selecao.isnumeric():
+    selecao = int(selecao)
+  else:
+    return {'erro': "Seleção inválida. Deve ser um ano (int), faixa de anos (tuple/list) ou None (todas as turmas)."}, 400
+
+  return curvas_sobrevivencia(selecao)
+
+def controller_caminho_critico(selecao):
+  if isinstance(selecao, (tuple, list)) and len(selecao) == 2:
+    selecao = list(selecao)
+  elif selecao == "Todos as turmas" or selecao is None:
+    selecao = None
+  elif selecao.isnumeric():
+    selecao = int(selecao)
+  else:
+    return {'erro': "Seleção inválida. Deve ser um ano (int), faixa de anos (tuple/list) ou None (todas as turmas)."}, 400
 
-  df_consolidado = None
-  if faixa:
-    df_consolidado = consolidar_metricas(faixa)
-  elif ano:
-    df_consolidado = consolidar_metricas(ano)
+  return atrasos_por_pre_requisito(selecao)
+
+def controller_painel(selecao, incluir_imagens=True):
+  if isinstance(selecao, (tuple, list)) and len(selecao) == 2:
+    faixa = list(selecao)  # Converte para lista, se necessário
+    ano = None
+  elif selecao == "Todos as turmas" or selecao is None:
+    faixa = None
+    ano = None
+  elif selecao.isnumeric():
+    faixa = None
+    ano = int(selecao)
   else:
-    df_consolidado = consolidar_metricas(None)
+    return {'erro': "Seleção inválida. Deve ser um ano (int), faixa de anos (tuple/list) ou None (todas as turmas)."}, 400
+
+  selecao_metricas = faixa or ano
+
+  # Cópia: o resultado das tabelas fica em cache e a resposta recebe as imagens
+  resposta = dict(calcular_tabelas(faixa, ano))
+
+  if incluir_imagens:
+    # Métricas dos fluxogramas, calculadas uma única vez e só se alguma imagem não estiver em cache
+    metricas = {}
+
+    def renderizar(tipo_visualizacao):
+      if not metricas:
+        metricas.update(calcular_metricas(selecao_metricas, TIPOS_METRICA))
+      return visualizar_disciplinas_por_metrica(selecao_metricas, tipo_visualizacao, metricas=metricas)
 
-  return ({
-    'analise_turma': analise_turma_result,
-    'df_consolidado': json.loads(df_consolidado),
-  })
+    # Mesmas chaves de generate_image: as imagens ficam em cache para as duas rotas
+    resposta['imagens'] = {}
+    for tipo_visualizacao in TIPOS_METRICA:
+      dados = cache_imagens.obter_ou_renderizar(
+        chave_imagem_metrica(tipo_visualizacao, selecao_metricas),
+        lambda: renderizar(tipo_visualizacao),
+      )
+      resposta['imagens'][tipo_visualizacao] = base64.b64encode(dados).decode('ascii')
+
+  return resposta
  
 
 def generate_process_mining_fluxograma(selecao, tipo_visualizacao):
   if isinstance(selecao, (tuple, list)) and len(selecao) == 2:
     faixa = list(selecao) 
-    image_name = executar_replay(faixa, tipo_visualizacao)
-
-    img_path = f'images/{image_name}'
+    imagem = executar_replay(faixa, tipo_visualizacao)
 
-    return send_file(img_path, mimetype='image/png')
+    return send_file(io.BytesIO(imagem), mimetype='image/png')
   
   return "Seleção inválida. Deve ser um intervalo de anos (tuple/list)."
 
@@ -77,32 +177,97 @@ def generate_process_mining_fluxograma(selecao, tipo_visualizacao):
 def generate_process_mining_petrinet(selecao, tipo_visualizacao):
   if isinstance(selecao, (tuple, list)) and len(selecao) == 2:
     faixa = list(selecao) 
-    image_name = executar_replay(faixa, tipo_visualizacao)
+    imagem = executar_replay(faixa, tipo_visualizacao)
 
-    img_path = f'images/{image_name}'
-
-    return send_file(img_path, mimetype='image/png')
+    return send_file(io.BytesIO(imagem), mimetype='image/png')
   
   return "Seleção inválida. Deve ser um intervalo de anos (tuple/list)."
 
 def generate_process_mining_barras(selecao, tipo_visualizacao):
   if isinstance(selecao, (tuple, list)) and len(selecao) == 2:
     faixa = list(selecao) 
-    image_name = executar_replay(faixa, tipo_visualizacao)
-
-    img_path = f'images/{image_name}'
+    imagem = executar_replay(faixa, tipo_visualizacao)
 
-    return send_file(img_path, mimetype='image/png')
+    return send_file(io.BytesIO(imagem), mimetype='image/png')
   
   return "Seleção inválida. Deve ser um intervalo de anos (tuple/list)."
 
 def generate_process_mining_pizza(selecao, tipo_visualizacao):
   if isinstance(selecao, (tuple, list)) and len(selecao) == 2:
     faixa = list(selecao) 
-    image_name = executar_replay(faixa, tipo_visualizacao)
+    imagem = executar_replay(faixa, tipo_visualizacao)
 
-    img_path = f'images/{image_name}'
-
-    return send_file(img_path, mimetype='image/png')
+    return send_file(io.BytesIO(imagem), mimetype='image/png')
   
-  return "Seleção inválida. Deve ser um intervalo de anos (tuple/list)."
\ No newline at end of file
+  return "Seleção inválida. Deve ser um intervalo de anos (tuple/list)."
+
+TIPOS_PROCESS_MINING = ['fluxograma', 'petrinet', 'barras', 'pizza']
+
+def submeter_process_mining(selecao, tipo_visualizacao):
+  if tipo_visualizacao not in TIPOS_PROCESS_MINING:
+    return {'erro': f"Tipo de visualização inválido. Use um de: {', '.join(TIPOS_PROCESS_MINING)}."}, 400
+
+  if not (isinstance(selecao, (tuple, list)) and len(selecao) == 2):
+    return {'erro': "Seleção inválida. Deve ser um intervalo de anos (tuple/list)."}, 400
+
+  faixa = list(selecao)
+
+  # Mesma visualização, faixa e dados geram o mesmo id: submissões repetidas compartilham a tarefa
+  # A tarefa usa a mesma versão do log que compôs o id, mesmo que o log seja recarregado antes dela rodar
+  versao = obter_versao_log()
+  id_tarefa = gerar_chave('process_mining', VERSAO_RENDER, tipo_visualizacao, faixa, versao.impressao, obter_impressao_rede())
+  status = tarefas.submeter(id_tarefa, lambda: executar_na_versao(versao, lambda: executar_replay(faixa, tipo_visualizacao)))
+  resultado = f'/v2/tarefas/{id_tarefa}'
+
+  # Tarefa já concluída: o cliente segue direto para o resultado
+  if status == tarefas.CONCLUIDA:
+    return {'id': id_tarefa, 'status': status, 'resultado': resultado}, 303, {'Location': resultado}
+
+  return {
+    'id': id_tarefa,
+    'status': status,
+    'resultado': resultado,
+  }, 202
+
+def consultar_tarefa(id_tarefa):
+  # Estado e resultado vêm do disco: a tarefa pode ter sido submetida a outro worker
+  status, valor = tarefas.consultar(id_tarefa)
+
+  if status is None:
+    return {'erro': 'Tarefa não encontrada.'}, 404
+  if status == tarefas.EM_ANDAMENTO:
+    return {'id': id_tarefa, 'status': status}, 202
+  if status == tarefas.ERRO:
+    return {'id': id_tarefa, 'status': status, 'erro': valor}, 500
+
+  return send_file(io.BytesIO(valor), mimetype='image/png')
+
+def controller_rede_petri():
+  # A imagem depende apenas do PNML
+  chave = gerar_chave('rede_petri', obter_impressao_rede())
+
+  if request.if_none_match.contains(chave):
+    return '', 304, {'ETag': f'"{chave}"'}
+
+  return send_file(io.BytesIO(gerar_imagem_rede_petri()), mimetype='image/png', etag=chave, max_age=0)
+
+def controller_versao_log():
+  arquivo = obter_impressao_arquivo_log()
+  versao = obter_versao_log().impressao
+
+  return {
+    'versao': versao,
+    'arquivo': arquivo,
+    'desatualizada': versao != arquivo,
+  }
+
+def controller_recarregar_log(token):
+  # Sem TOKEN_ADMIN configurado a recarga manual fica desabilitada
+  esperado = os.environ.get('TOKEN_ADMIN')
+  if not esperado or not hmac.compare_digest(token or '', esperado):
+    return {'erro': 'Não autorizado.'}, 403
+
+  # A recarga roda em segundo plano; esta requisição e as em andamento seguem com a versão atual
+  recarregar_em_segundo_plano()
+
+  return dict(controller_versao_log(), status='recarregando'), 202
@@ -1,7 +1,7 @@
 from flask import request
 from app import server
 
-from app.controllers.process_v2 import generate_image, controller_tabelas, generate_process_mining_fluxograma, generate_process_mining_petrinet, generate_process_mining_barras, generate_process_mining_pizza
+from app.controllers.process_v2 import generate_image, controller_tabelas, controller_painel, generate_process_mining_fluxograma, generate_process_mining_petrinet, generate_process_mining_barras, generate_process_mining_pizza, submeter_process_mining, consultar_tarefa, controller_versao_log, controller_recarregar_log, controller_sobrevivencia, controller_caminho_critico, controller_rede_petri
 
 @server.route("/")
 def index():
@@ -12,13 +12,14 @@ def visualizacao_v2():
   selecao1 = request.args.get('selecao')
   selecao2 = request.args.get('selecao2')
   tipo_visualizacao = request.args.get('type')
+  sobrepor_atrasos = request.args.get('atrasos', '0') == '1'
 
   if selecao2:
     selecao = (int(selecao1), int(selecao2))
   else:
     selecao = selecao1
   
-  return generate_image(selecao, tipo_visualizacao)
+  return generate_image(selecao, tipo_visualizacao, sobrepor_atrasos)
 
 @server.route('/v2/visualizacao/tabelas', methods=['GET'])
 def analise_turmas():
@@ -31,7 +32,44 @@ def analise_turmas():
     selecao = selecao1
   
   return controller_tabelas(selecao)
+
+@server.route('/v2/visualizacao/painel', methods=['GET'])
+def painel_turmas():
+  selecao1 = request.args.get('selecao')
+  selecao2 = request.args.get('selecao2')
+  incluir_imagens = request.args.get('imagens', '1') != '0'
+
+  if selecao2:
+    selecao = (int(selecao1), int(selecao2))
+  else:
+    selecao = selecao1
+
+  return controller_painel(selecao, incluir_imagens)
   
+@server.route('/v2/analise/sobrevivencia', methods=['GET'])
+def sobrevivencia_turmas():
+  selecao1 = request.args.get('selecao')
+  selecao2 = request.args.get('selecao2')
+
+  if selecao2:
+    selecao = (int(selecao1), int(selecao2))
+  else:
+    selecao = selecao1
+
+  return controller_sobrevivencia(selecao)
+
+@server.route('/v2/analise/caminho-critico', methods=['GET'])
+def caminho_critico_turmas():
+  selecao1 = request.args.get('selecao')
+  selecao2 = request.args.get('selecao2')
+
+  if selecao2:
+    selecao = (int(selecao1), int(selecao2))
+  else:
+    selecao = selecao1
+
+  return controller_caminho_critico(selecao)
+
 @server.route('/v2/visualizacao/fluxograma', methods=['GET'])
 def mineracao_processos_fluxograma_rota():
   selecao1 = request.args.get('selecao')
@@ -46,6 +84,10 @@ def mineracao_processos_fluxograma_rota():
 
 
 
+@server.route('/v2/visualizacao/rede', methods=['GET'])
+def rede_petri_rota():
+  return controller_rede_petri()
+
 @server.route('/v2/visualizacao/petrinet', methods=['GET'])
 def mineracao_processos_petrinet_rota():
   selecao1 = request.args.get('selecao')
@@ -81,4 +123,29 @@ def mineracao_processos_pizza_rota():
   else:
     selecao = selecao1
 
-  return generate_process_mining_pizza(selecao, 'pizza')
\ No newline at end of file
+  return generate_process_mining_pizza(selecao, 'pizza')
+
+@server.route('/v2/tarefas', methods=['POST'])
+def submeter_tarefa_rota():
+  tipo_visualizacao = request.values.get('type')
+  selecao1 = request.values.get('selecao')
+  selecao2 = request.values.get('selecao2')
+
+  if selecao2:
+    selecao = (int(selecao1), int(selecao2))
+  else:
+    selecao = selecao1
+
+  return submeter_process_mining(selecao, tipo_visualizacao)
+
+@server.route('/v2/tarefas/<id_tarefa>', methods=['GET'])
+def consultar_tarefa_rota(id_tarefa):
+  return consultar_tarefa(id_tarefa)
+
+@server.route('/v2/admin/log', methods=['GET'])
+def versao_log_rota():
+  return controller_versao_log()
+
+@server.route('/v2/admin/log/recarregar', methods=['POST'])
+def recarregar_log_rota():
+  return controller_recarregar_log(request.headers.get('X-Token-Admin'))
@@ -0,0 +1,218 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+_impressoes = {}
+
+
+def impressao_digital_arquivo(caminho):
+    """
+    Calcula a impressão digital (sha256) do conteúdo de um arquivo.
+
+    O resultado é memorizado por (caminho, mtime, tamanho), então o arquivo só é relido quando muda.
+
+    :param caminho: Caminho do arquivo.
+    :return: String hexadecimal com o sha256 do conteúdo.
+    """
+    estado = os.stat(caminho)
+    chave = (os.path.abspath(caminho), estado.st_mtime_ns, estado.st_size)
+
+    if chave not in _impressoes:
+        sha = hashlib.sha256()
+        with open(caminho, 'rb') as arquivo:
+            for bloco in iter(lambda: arquivo.read(1 << 20), b''):
+                sha.update(bloco)
+        _impressoes[chave] = sha.hexdigest()
+
+    return _impressoes[chave]
+
+
+def gerar_chave(*partes):
+    """
+    Gera uma chave estável (sha256) a partir das partes informadas.
+
+    :param partes: Valores que identificam o conteúdo (ex.: métrica, seleção, impressão digital dos dados).
+    :return: String hexadecimal usada como chave de cache e como ETag.
+    """
+    return hashlib.sha256(repr(partes).encode('utf-8')).hexdigest()
+
+
+class CacheLRU:
+    """Cache em memória, seguro para threads, com descarte do item menos recentemente usado."""
+
+    def __init__(self, max_itens=32):
+        self.max_itens = max_itens
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, chave):
+        with self._lock:
+            if chave not in self._itens:
+                return None
+            self._itens.move_to_end(chave)
+            return self._itens[chave]
+
+    def guardar(self, chave, valor):
+        with self._lock:
+            self._itens[chave] = valor
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+
+
+class CacheCalculo:
+    """
+    Cache em memória (LRU) para resultados de cálculos caros.
+
+    Requisições concorrentes pela mesma chave aguardam um único cálculo em vez de repeti-lo.
+    """
+
+    def __init__(self, max_itens=8):
+        self._itens = CacheLRU(max_itens)
+        self._em_andamento = {}
+        self._lock = threading.Lock()
+
+    def obter_ou_calcular(self, chave, calcular):
+        """
+        Retorna o valor em cache ou chama `calcular()`, uma única vez por chave mesmo sob concorrência.
+
+        :param chave: Chave do resultado.
+        :param calcular: Função sem argumentos que produz o valor (não pode retornar None).
+        :return: Valor calculado ou em cache.
+        """
+        with self._lock:
+            valor = self._itens.obter(chave)
+            if valor is not None:
+                return valor
+
+            futuro = self._em_andamento.get(chave)
+            responsavel = futuro is None
+            if responsavel:
+                futuro = Future()
+                self._em_andamento[chave] = futuro
+
+        # Outra thread já está calculando esta chave
+        if not responsavel:
+            return futuro.result()
+
+        try:
+            valor = calcular()
+            self._itens.guardar(chave, valor)
+            futuro.set_result(valor)
+            return valor
+        except BaseException as erro:
+            futuro.set_exception(erro)
+            raise
+        finally:
+            with self._lock:
+                del self._em_andamento[chave]
+
+    def limpar(self):
+        self._itens.limpar()
+
+
+class CacheDisco:
+    """
+    Cache de bytes em disco limitado por tamanho total.
+
+    Cada entrada é um arquivo nomeado pela chave; o mtime marca o último uso e
+    os arquivos mais antigos são removidos quando o limite é ultrapassado.
+    """
+
+    def __init__(self, diretorio, max_bytes=200 * 1024 * 1024):
+        self.diretorio = diretorio
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(diretorio, exist_ok=True)
+
+    def _caminho(self, chave):
+        return os.path.join(self.diretorio, chave)
+
+    def obter(self, chave):
+        caminho = self._caminho(chave)
+        try:
+            with open(caminho, 'rb') as arquivo:
+                dados = arquivo.read()
+            os.utime(caminho)
+            return dados
+        except FileNotFoundError:
+            return None
+
+    def contem(self, chave):
+        """Indica se a chave está em disco, sem ler o arquivo nem marcar o uso."""
+        return os.path.exists(self._caminho(chave))
+
+    def guardar(self, chave, dados):
+        caminho = self._caminho(chave)
+        temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+        # Escrita atômica: outros processos nunca leem um arquivo pela metade
+        with open(temporario, 'wb') as arquivo:
+            arquivo.write(dados)
+        os.replace(temporario, caminho)
+
+        self._descartar_excedente()
+
+    def _descartar_excedente(self):
+        with self._lock:
+            entradas = []
+            for nome in os.listdir(self.diretorio):
+                if nome.endswith('.tmp'):
+                    continue
+                try:
+                    estado = os.stat(os.path.join(self.diretorio, nome))
+                except FileNotFoundError:
+                    continue
+                entradas.append((estado.st_mtime, estado.st_size, nome))
+
+            total = sum(tamanho for _, tamanho, _ in entradas)
+            for _, tamanho, nome in sorted(entradas):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(self.diretorio, nome))
+                except FileNotFoundError:
+                    pass
+                total -= tamanho
+
+
+class CacheRender:
+    """
+    Cache de imagens renderizadas em dois níveis: memória (quente) e disco (LRU limitado por bytes).
+    """
+
+    def __init__(self, diretorio, max_itens_memoria=32, max_bytes_disco=200 * 1024 * 1024):
+        self.memoria = CacheLRU(max_itens_memoria)
+        self.disco = CacheDisco(diretorio, max_bytes_disco)
+
+    def obter(self, chave):
+        dados = self.memoria.obter(chave)
+        if dados is None:
+            dados = self.disco.obter(chave)
+            if dados is not None:
+                self.memoria.guardar(chave, dados)
+        return dados
+
+    def guardar(self, chave, dados):
+        self.memoria.guardar(chave, dados)
+        self.disco.guardar(chave, dados)
+
+    def obter_ou_renderizar(self, chave, renderizar):
+        """
+        Retorna os bytes da imagem em cache ou chama `renderizar()` para produzi-los.
+
+        :param chave: Chave do conteúdo.
+        :param renderizar: Função sem argumentos que retorna os bytes da imagem.
+        :return: Bytes da imagem.
+        """
+        dados = self.obter(chave)
+        if dados is None:
+            dados = renderizar()
+            self.guardar(chave, dados)
+        return dados
@@ -0,0 +1,167 @@
+import numpy as np
+
+from app.utils.fluxograma import disciplinas, transicoes
+from app.utils.indice import semestre
+from app.utils.registro import obter_indice, obter_matriz
+
+
+def ordem_topologica(arestas=None):
+    """
+    Ordena as disciplinas do fluxograma de forma que cada pré-requisito venha antes das
+    disciplinas que dependem dele (algoritmo de Kahn, desempate pela ordem dos blocos).
+
+    :param arestas: Dicionário pré-requisito -> disciplinas liberadas; padrão: `transicoes`.
+    :return: Lista de códigos de disciplina.
+    """
+    arestas = transicoes if arestas is None else arestas
+    nos = [disciplina for linha in disciplinas for disciplina in linha]
+    for origem, destinos in arestas.items():
+        nos.extend(no for no in [origem] + destinos if no not in nos)
+
+    entrada = {no: 0 for no in nos}
+    for destinos in arestas.values():
+        for destino in destinos:
+            entrada[destino] += 1
+
+    ordem = []
+    prontos = [no for no in nos if entrada[no] == 0]
+    while prontos:
+        no = prontos.pop(0)
+        ordem.append(no)
+        for destino in arestas.get(no, []):
+            entrada[destino] -= 1
+            if entrada[destino] == 0:
+                prontos.append(destino)
+
+    if len(ordem) != len(nos):
+        raise ValueError("os pré-requisitos do fluxograma possuem um ciclo")
+
+    return ordem
+
+
+def _caminho_mais_pesado(ordem, pesos):
+    # Programação dinâmica na ordem topológica: maior soma de pesos terminando em cada disciplina
+    melhor = {no: 0 for no in ordem}
+    anterior = {}
+    for no in ordem:
+        for destino in transicoes.get(no, []):
+            peso = melhor[no] + pesos.get((no, destino), 0)
+            if peso > melhor[destino]:
+                melhor[destino] = peso
+                anterior[destino] = no
+
+    fim = max(ordem, key=lambda no: melhor[no])
+    if melhor[fim] == 0:
+        return []
+
+    caminho = [fim]
+    while caminho[-1] in anterior:
+        caminho.append(anterior[caminho[-1]])
+
+    return caminho[::-1]
+
+
+def atrasos_por_pre_requisito(selecao=None):
+    """
+    Propaga o atraso de cada aluno pelas cadeias de pré-requisitos e acumula, por turma, quantos
+    semestres de atraso cada aresta do fluxograma transmitiu.
+
+    O atraso de um aluno em uma disciplina é o número de semestres entre a primeira aprovação e o
+    semestre previsto pelo bloco da disciplina, contado a partir do ingresso (mínimo 0). Em cada
+    disciplina, o pré-requisito crítico é o de maior atraso (argmax sobre os pré-requisitos; os
+    não aprovados contam como -1 e o empate fica com o primeiro); a parte do atraso explicada por
+    ele (o menor dos dois atrasos) é atribuída à aresta pré-requisito -> disciplina. Percorrendo as
+    disciplinas em ordem topológica, cada atraso herdado também é atribuído à disciplina onde a
+    cadeia começou (ex.: uma reprovação em QXD0001 que atrasa QXD0007 e, por ela, QXD0016).
+
+    Todos os alunos da seleção são processados juntos: cada disciplina é uma operação sobre as
+    colunas da matriz aluno × disciplina.
+
+    :param selecao: Ano de ingresso (int), faixa de anos (list) ou None para todas as turmas.
+    :return: Dicionário com 'arestas' e 'origens' da seleção, em ordem decrescente de atraso,
+             'caminho_critico' (cadeia de pré-requisitos que acumulou mais atraso) e 'turmas'
+             (as mesmas listas por ano de ingresso).
+    """
+    indice = obter_indice()
+    matriz = obter_matriz()
+
+    ordem = ordem_topologica()
+    posicao = {disciplina: i for i, disciplina in enumerate(ordem)}
+    bloco = {disciplina: i for i, linha in enumerate(disciplinas) for disciplina in linha}
+    lista_arestas = [(origem, destino) for origem in ordem for destino in transicoes.get(origem, [])]
+    numero_aresta = {aresta: i for i, aresta in enumerate(lista_arestas)}
+    pre_requisitos = {destino: [origem for origem, d in lista_arestas if d == destino] for destino in ordem}
+
+    alunos = indice.alunos_da_selecao(selecao)
+    turmas, turma = np.unique(indice.ano_ingresso[alunos], return_inverse=True)
+    num_alunos = len(turma)
+
+    # Atraso de cada aluno em cada disciplina do fluxograma (colunas na ordem topológica); -1 se não foi aprovado
+    coluna_do_log = {disciplina: i for i, disciplina in enumerate(indice.disciplinas)}
+    aprovacao = np.full((num_alunos, len(ordem)), -1, dtype=np.int64)
+    for disciplina, coluna in coluna_do_log.items():
+        if disciplina in posicao:
+            aprovacao[:, posicao[disciplina]] = matriz.semestre_aprovacao[alunos, coluna]
+
+    ingresso = semestre(indice.dia_ingresso[alunos]).astype(np.int64)
+    previsto = ingresso[:, None] + np.array([bloco.get(disciplina, 0) for disciplina in ordem])
+    atraso = np.where(aprovacao >= 0, np.maximum(aprovacao - previsto, 0), -1)
+
+    # Disciplina onde começa a cadeia de atraso de cada (aluno, disciplina)
+    origem_cadeia = np.tile(np.arange(len(ordem)), (num_alunos, 1))
+    linhas = np.arange(num_alunos)
+
+    def contar(chaves, pesos, forma):
+        return np.bincount(chaves, weights=pesos, minlength=forma[0] * forma[1]).astype(np.int64).reshape(forma)
+
+    atraso_aresta = np.zeros((len(turmas), len(lista_arestas)), dtype=np.int64)
+    alunos_aresta = np.zeros((len(turmas), len(lista_arestas)), dtype=np.int64)
+    atraso_origem = np.zeros((len(turmas), len(ordem)), dtype=np.int64)
+
+    for disciplina in ordem:
+        pais = pre_requisitos[disciplina]
+        if not pais or num_alunos == 0:
+            continue
+
+        j = posicao[disciplina]
+        colunas_pais = np.array([posicao[pai] for pai in pais])
+        atraso_pais = atraso[:, colunas_pais]
+        critico = np.argmax(atraso_pais, axis=1)
+        atraso_critico = atraso_pais[linhas, critico]
+
+        # Pais já resolvidos (ordem topológica): a cadeia continua a do pré-requisito crítico
+        herdou = (atraso[:, j] > 0) & (atraso_critico > 0)
+        herdado = np.where(herdou, np.minimum(atraso[:, j], atraso_critico), 0)
+        origem_cadeia[:, j] = np.where(herdou, origem_cadeia[linhas, colunas_pais[critico]], j)
+
+        # Acumulação por (turma, aresta) e (turma, origem) com bincount sobre a chave combinada
+        arestas_alunos = turma * len(lista_arestas) + np.array([numero_aresta[(pai, disciplina)] for pai in pais])[critico]
+        atraso_aresta += contar(arestas_alunos, herdado, atraso_aresta.shape)
+        alunos_aresta += contar(arestas_alunos, herdou, alunos_aresta.shape)
+        atraso_origem += contar(turma * len(ordem) + origem_cadeia[:, j], herdado, atraso_origem.shape)
+
+    def listar(atraso_por_aresta, alunos_por_aresta, atraso_por_origem):
+        arestas = [
+            {'origem': origem, 'destino': destino, 'atraso': int(atraso_por_aresta[i]), 'alunos': int(alunos_por_aresta[i])}
+            for i, (origem, destino) in enumerate(lista_arestas) if atraso_por_aresta[i] > 0
+        ]
+        origens = [
+            {'disciplina': disciplina, 'atraso': int(atraso_por_origem[i])}
+            for i, disciplina in enumerate(ordem) if atraso_por_origem[i] > 0
+        ]
+        pesos = {aresta: int(atraso_por_aresta[i]) for i, aresta in enumerate(lista_arestas)}
+
+        return {
+            'arestas': sorted(arestas, key=lambda aresta: -aresta['atraso']),
+            'origens': sorted(origens, key=lambda origem: -origem['atraso']),
+            'caminho_critico': _caminho_mais_pesado(ordem, pesos),
+        }
+
+    resultado = listar(atraso_aresta.sum(axis=0), alunos_aresta.sum(axis=0), atraso_origem.sum(axis=0))
+    resultado['alunos'] = num_alunos
+    resultado['turmas'] = [
+        {'turma': int(ano), 'alunos': int(np.count_nonzero(turma == i)), **listar(atraso_aresta[i], alunos_aresta[i], atraso_origem[i])}
+        for i, ano in enumerate(turmas)
+    ]
+
+    return resultado
@@ -0,0 +1,120 @@
+import threading
+
+import pygraphviz as pgv
+
+# Disciplinas organizadas por blocos (uma linha por semestre)
+disciplinas = [
+    ["QXD0001", "QXD0108", "QXD0005", "QXD0109", "QXD0103", "QXD0056"],
+    ["QXD0007", "QXD0010", "QXD0013", "QXD0006", "QXD0008"],
+    ["QXD0115", "QXD0017", "QXD0114", "QXD0012", "QXD0040"],
+    ["QXD0011", "QXD0014", "QXD0016", "QXD0041", "QXD0116"],
+    ["QXD0020", "QXD0021", "QXD0025", "QXD0119", "QXD0120"],
+    ["QXD0019", "QXD0037", "QXD0038", "QXD0043", "QXD0046"],
+    ["QXD0029", "QXD0110"],
+]
+
+# Pré-requisitos (arestas do fluxograma)
+transicoes = {
+    "QXD0001": ["QXD0007", "QXD0010"],
+    "QXD0005": ["QXD0013"],
+    "QXD0056": ["QXD0008", "QXD0012"],
+    "QXD0109": ["QXD0006"],
+    "QXD0007": ["QXD0016", "QXD0020", "QXD0014", "QXD0019"],
+    "QXD0010": ["QXD0115", "QXD0041"],
+    "QXD0008": ["QXD0040", "QXD0041"],
+    "QXD0013": ["QXD0043"],
+    "QXD0116": ["QXD0119", "QXD0120"],
+    "QXD0046": ["QXD0110"],
+}
+
+_modelo = None
+_lock_modelo = threading.Lock()
+
+
+def _construir_modelo():
+    """
+    Monta o fluxograma sem cores e executa o layout 'dot' uma única vez.
+
+    Os nós têm tamanho fixo, então a geometria não depende dos rótulos nem das cores.
+
+    :return: Código DOT do grafo já posicionado.
+    """
+    G = pgv.AGraph(strict=False, directed=True, rankdir='TB')
+    G.graph_attr['splines'] = 'ortho'
+    G.graph_attr['nodesep'] = '0.6'
+    G.graph_attr['ranksep'] = '0.7'
+
+    subgraphs = []
+    for i, linha in enumerate(disciplinas):
+        with G.subgraph(name="cluster_" + str(i)) as s:
+            s.graph_attr['rank'] = 'same'
+            s.graph_attr['color'] = 'transparent'
+            for disciplina in linha:
+                s.add_node(
+                    disciplina,
+                    shape='box',
+                    style='filled',
+                    fillcolor='white',
+                    fontsize=19,  # Font size padrão para fallback
+                    fontname='Arial',  # Fonte principal
+                    label=disciplina,
+                    fixedsize=True,
+                    width=3,
+                    height=1.8
+                )
+            subgraphs.append(s)
+
+    # Adicionar transições (arestas)
+    for origem, destinos in transicoes.items():
+        for destino in destinos:
+            G.add_edge(origem, destino, directed=True, arrowhead='normal', constraint=False)
+
+    # Adicionar arestas invisíveis para alinhar blocos
+    for i in range(len(subgraphs) - 1):
+        node1 = list(subgraphs[i].nodes())[0]
+        node2 = list(subgraphs[i + 1].nodes())[0]
+        G.add_edge(node1, node2, style='invis', weight=10)
+
+    G.layout(prog='dot')
+
+    return G.to_string()
+
+
+def obter_modelo():
+    """Retorna o fluxograma posicionado, calculando o layout na primeira chamada do processo."""
+    global _modelo
+
+    if _modelo is None:
+        with _lock_modelo:
+            if _modelo is None:
+                _modelo = _construir_modelo()
+
+    return _modelo
+
+
+def desenhar_fluxograma(cores, rotulos, caminho=None, formato='png', espessuras=None):
+    """
+    Desenha o fluxograma reaproveitando o layout pré-calculado: apenas cores, rótulos e
+    espessuras das arestas mudam.
+
+    :param cores: Dicionário disciplina -> cor de preenchimento (hex).
+    :param rotulos: Dicionário disciplina -> texto do nó.
+    :param caminho: Caminho do arquivo de saída; se None, os bytes da imagem são retornados.
+    :param formato: Formato de saída ('png', 'svg', ...).
+    :param espessuras: Dicionário (pré-requisito, disciplina) -> espessura da aresta (penwidth), opcional.
+    :return: Bytes da imagem quando `caminho` é None.
+    """
+    G = pgv.AGraph(string=obter_modelo())
+
+    for linha in disciplinas:
+        for disciplina in linha:
+            node = G.get_node(disciplina)
+            node.attr['fillcolor'] = cores[disciplina]
+            node.attr['label'] = rotulos[disciplina]
+
+    # As arestas já têm o traçado do layout; a espessura não altera as posições
+    for (origem, destino), espessura in (espessuras or {}).items():
+        G.get_edge(origem, destino).attr['penwidth'] = f'{espessura:.2f}'
+
+    # neato -n2 usa as posições já existentes, sem executar um novo layout
+    return G.draw(caminho, format=formato, prog='neato', args='-n2')
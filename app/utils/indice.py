@@ -0,0 +1,250 @@
+import numpy as np
+import pandas as pd
+
+class IndiceLog:
+    """
+    Índice colunar do log de eventos, construído uma única vez a partir do df_final.
+
+    Por evento:
+    - aluno: posição do aluno em `ids_alunos` (int32).
+    - disciplina: posição da disciplina em `disciplinas` (int16), -1 para 'Iniciou' e 'verificador'.
+    - resultado: posição do resultado em `resultados` (int8), ex.: '' (inscrição), 'APROVADO', 'SUPRIMIDO'.
+    - ano: ano do evento (int16).
+    - dia: data do evento com resolução de dia (datetime64[D]).
+    - ordem_aluno_disciplina: posições dos eventos ordenadas por aluno, disciplina e dia (estável);
+      filtrar essa ordem por uma máscara dá a mesma ordenação de um lexsort do subconjunto.
+
+    Por aluno:
+    - ano_ingresso: ano do evento 'Iniciou' (int16), -1 se o aluno não possui o evento.
+    - dia_ingresso / dia_formatura: data do evento 'Iniciou' / 'verificador' (NaT se não possui).
+    - ultimo_dia: data do último evento do aluno.
+    - formado: possui o evento 'verificador'.
+    - ativo: possui algum evento em `ano_ativo`, o último ano com eventos no log.
+    """
+
+    def __init__(self, df):
+        # Alunos
+        self.ids_alunos, aluno = np.unique(df['id_discente'].to_numpy(), return_inverse=True)
+        self.aluno = aluno.astype(np.int32)
+        num_alunos = len(self.ids_alunos)
+
+        # Códigos de atividade: as operações de texto são feitas apenas nos valores distintos
+        codigos_atividade, categorias = pd.factorize(df['codigo'], sort=True)
+        categorias = pd.Series(categorias)
+        partes = categorias.str.split('_', n=1)
+        disciplina_categoria = partes.str[0]
+        resultado_categoria = partes.str[1].fillna('')
+
+        especiais = categorias.isin(['Iniciou', 'verificador']).to_numpy()
+
+        self.disciplinas = np.array(sorted(disciplina_categoria[~especiais].unique()), dtype=object)
+        posicao_disciplina = {disciplina: i for i, disciplina in enumerate(self.disciplinas)}
+        mapa_disciplina = np.array(
+            [-1 if especial else posicao_disciplina[disciplina]
+             for disciplina, especial in zip(disciplina_categoria, especiais)],
+            dtype=np.int16,
+        )
+
+        self.resultados = np.array(sorted(resultado_categoria[~especiais].unique()), dtype=object)
+        posicao_resultado = {resultado: i for i, resultado in enumerate(self.resultados)}
+        mapa_resultado = np.array(
+            [-1 if especial else posicao_resultado[resultado]
+             for resultado, especial in zip(resultado_categoria, especiais)],
+            dtype=np.int8,
+        )
+
+        self.disciplina = mapa_disciplina[codigos_atividade]
+        self.resultado = mapa_resultado[codigos_atividade]
+
+        # Datas
+        self.dia = df['timestamp'].to_numpy().astype('datetime64[D]')
+        self.ano = df['timestamp'].dt.year.to_numpy().astype(np.int16)
+
+        self.ordem_aluno_disciplina = np.lexsort((self.dia, self.disciplina, self.aluno))
+
+        # Eventos especiais por aluno
+        iniciou = (categorias.to_numpy() == 'Iniciou')[codigos_atividade]
+        verificador = (categorias.to_numpy() == 'verificador')[codigos_atividade]
+
+        self.ano_ingresso = np.full(num_alunos, -1, dtype=np.int16)
+        self.ano_ingresso[self.aluno[iniciou]] = self.ano[iniciou]
+
+        self.dia_ingresso = np.full(num_alunos, np.datetime64('NaT'), dtype='datetime64[D]')
+        self.dia_ingresso[self.aluno[iniciou]] = self.dia[iniciou]
+        self.dia_formatura = np.full(num_alunos, np.datetime64('NaT'), dtype='datetime64[D]')
+        self.dia_formatura[self.aluno[verificador]] = self.dia[verificador]
+
+        ultimo_dia = np.full(num_alunos, np.iinfo(np.int64).min, dtype=np.int64)
+        np.maximum.at(ultimo_dia, self.aluno, self.dia.view(np.int64))
+        self.ultimo_dia = ultimo_dia.view('datetime64[D]')
+
+        self.formado = np.bincount(self.aluno[verificador], minlength=num_alunos) > 0
+        self.ano_ativo = int(self.ano.max()) if len(self.ano) else -1
+        self.ativo = np.bincount(self.aluno[self.ano == self.ano_ativo], minlength=num_alunos) > 0
+
+    def eventos_com_resultado(self, texto):
+        """
+        Máscara dos eventos cujo código contém `texto` (ex.: '_APROVADO', '_TRANCADO').
+
+        Equivale a df_final['codigo'].str.contains(texto), avaliado apenas nos resultados distintos.
+        """
+        # A última posição (False) atende os eventos especiais, que têm resultado -1
+        resultados = np.array([texto in '_' + resultado for resultado in self.resultados] + [False])
+        return resultados[self.resultado]
+
+    def alunos_da_selecao(self, selecao=None):
+        """
+        Máscara booleana dos alunos que iniciaram o curso na seleção.
+
+        Parâmetros:
+        - selecao: Ano específico (int), faixa de anos (list) ou None (todos os alunos com 'Iniciou').
+
+        Retorno:
+        - np.ndarray de bool com uma posição por aluno.
+        """
+        if isinstance(selecao, list):  # Faixa de anos
+            return (self.ano_ingresso >= selecao[0]) & (self.ano_ingresso <= selecao[1])
+        elif isinstance(selecao, int):  # Ano específico
+            return self.ano_ingresso == selecao
+        else:  # Todos os anos
+            return self.ano_ingresso >= 0
+
+    def contar_por_disciplina(self, mascara):
+        """
+        Conta os eventos selecionados por disciplina, no formato Código/Quantidade em ordem decrescente.
+
+        :param mascara: Máscara booleana sobre os eventos.
+        :return: DataFrame com as colunas 'Código' e 'Quantidade'.
+        """
+        return contar_codigos(self.disciplina[mascara], self.disciplinas)
+
+
+def semestre(dias):
+    """
+    Índice do semestre de cada data: 2 por ano desde 1970, janeiro-junho e julho-dezembro.
+
+    :param dias: Datas datetime64[D].
+    :return: Array int64 com o índice do semestre.
+    """
+    return dias.astype('datetime64[M]').astype(np.int64) // 6
+
+
+class MatrizAlunoDisciplina:
+    """
+    Resultados de cada aluno em cada disciplina, em planos densos (alunos × disciplinas) com as
+    mesmas posições de IndiceLog.ids_alunos e IndiceLog.disciplinas.
+
+    Cada par (aluno, disciplina) tem uma inscrição seguida do resultado por tentativa:
+    - eventos: eventos do par (uint8); cursou = eventos > 0.
+    - tentativas: inscrições do par (uint8).
+    - primeiro_resultado: resultado do segundo evento em ordem de data, isto é, da primeira
+      tentativa (int8, posição em IndiceLog.resultados), -1 se o par tem menos de dois eventos.
+    - aprovado: foi aprovado em alguma tentativa.
+    - aprovado_na_repeticao: foi aprovado, mas não na primeira tentativa.
+    - supressoes / trancamentos: eventos '_SUPRIMIDO' / '_TRANCADO' do par (uint8).
+    - ano_primeira_tentativa: ano do primeiro evento do par (int16), -1 se não cursou.
+    - semestre_aprovacao: semestre (ver semestre) da primeira aprovação (int16), -1 se não foi aprovado.
+
+    Uma métrica por disciplina é um filtro das linhas (alunos da seleção) seguido de uma
+    redução por coluna (ver somar).
+    """
+
+    def __init__(self, indice):
+        num_alunos = len(indice.ids_alunos)
+        num_disciplinas = len(indice.disciplinas)
+        forma = (num_alunos, num_disciplinas)
+        tamanho = num_alunos * num_disciplinas
+
+        # Eventos de disciplinas ordenados por aluno, disciplina e data, e sua chave (aluno, disciplina)
+        ordem = indice.ordem_aluno_disciplina
+        posicoes = ordem[indice.disciplina[ordem] >= 0]
+        pares = indice.aluno[posicoes].astype(np.int64) * num_disciplinas + indice.disciplina[posicoes]
+
+        def contar(mascara):
+            contagem = np.bincount(pares[mascara], minlength=tamanho)
+            return np.minimum(contagem, np.iinfo(np.uint8).max).astype(np.uint8).reshape(forma)
+
+        self.eventos = contar(np.ones(len(pares), dtype=bool))
+        self.cursou = self.eventos > 0
+        self.tentativas = contar(np.isin(indice.resultado[posicoes], np.flatnonzero(indice.resultados == '')))
+        self.aprovado = contar(indice.eventos_com_resultado('_APROVADO')[posicoes]) > 0
+        self.supressoes = contar(indice.eventos_com_resultado('_SUPRIMIDO')[posicoes])
+        self.trancamentos = contar(indice.eventos_com_resultado('_TRANCADO')[posicoes])
+
+        inicio_grupo = np.ones(len(pares), dtype=bool)
+        inicio_grupo[1:] = pares[1:] != pares[:-1]
+        segunda_ocorrencia = np.zeros(len(pares), dtype=bool)
+        segunda_ocorrencia[1:] = inicio_grupo[:-1] & ~inicio_grupo[1:]
+
+        self.primeiro_resultado = np.full(tamanho, -1, dtype=np.int8)
+        self.primeiro_resultado[pares[segunda_ocorrencia]] = indice.resultado[posicoes[segunda_ocorrencia]]
+        self.primeiro_resultado = self.primeiro_resultado.reshape(forma)
+
+        self.ano_primeira_tentativa = np.full(tamanho, -1, dtype=np.int16)
+        self.ano_primeira_tentativa[pares[inicio_grupo]] = indice.ano[posicoes[inicio_grupo]]
+        self.ano_primeira_tentativa = self.ano_primeira_tentativa.reshape(forma)
+
+        # Eventos ordenados por data dentro do par: a primeira aprovação é a primeira ocorrência
+        aprovacoes = np.flatnonzero(indice.eventos_com_resultado('_APROVADO')[posicoes])
+        pares_aprovados, primeira_aprovacao = np.unique(pares[aprovacoes], return_index=True)
+        self.semestre_aprovacao = np.full(tamanho, -1, dtype=np.int16)
+        self.semestre_aprovacao[pares_aprovados] = semestre(indice.dia[posicoes[aprovacoes[primeira_aprovacao]]])
+        self.semestre_aprovacao = self.semestre_aprovacao.reshape(forma)
+
+        self.resultados = indice.resultados
+        self.aprovado_na_repeticao = self.aprovado & (self.primeiro_resultado != self.codigo_resultado('APROVADO'))
+
+    def codigo_resultado(self, resultado):
+        """
+        Posição de um resultado (ex.: 'APROVADO') em `resultados`, usada em primeiro_resultado;
+        -2, que não ocorre em primeiro_resultado, se nenhum evento tem esse resultado.
+        """
+        posicoes = np.flatnonzero(self.resultados == resultado)
+        return int(posicoes[0]) if len(posicoes) else -2
+
+    def somar(self, plano, alunos=None):
+        """
+        Soma um plano por disciplina sobre os alunos selecionados.
+
+        :param plano: Plano (alunos × disciplinas) de contagens ou booleanos.
+        :param alunos: Máscara booleana dos alunos; None para todos.
+        :return: Vetor int64 com uma posição por disciplina.
+        """
+        if alunos is not None:
+            plano = plano[alunos]
+
+        return plano.sum(axis=0, dtype=np.int64)
+
+
+def contar_codigos(codigos, rotulos):
+    """
+    Conta códigos inteiros e monta a tabela Código/Quantidade na mesma ordem de value_counts.
+
+    :param codigos: Códigos (posições em `rotulos`) na ordem em que ocorrem.
+    :param rotulos: Rótulo de cada código.
+    :return: DataFrame com as colunas 'Código' e 'Quantidade' em ordem decrescente.
+    """
+    contagem = np.bincount(codigos, minlength=len(rotulos))
+
+    # Mesma ordenação de value_counts: ordem da primeira ocorrência, depois contagem decrescente
+    presentes, primeira_ocorrencia = np.unique(codigos, return_index=True)
+
+    return tabela_contagem(contagem, presentes[np.argsort(primeira_ocorrencia)], rotulos)
+
+
+def tabela_contagem(contagem, presentes, rotulos):
+    """
+    Monta a tabela Código/Quantidade a partir de uma contagem por código.
+
+    :param contagem: Quantidade por código.
+    :param presentes: Códigos que entram na tabela, na ordem da primeira ocorrência.
+    :param rotulos: Rótulo de cada código.
+    :return: DataFrame com as colunas 'Código' e 'Quantidade' em ordem decrescente.
+    """
+    quantidade = pd.Series(contagem[presentes].astype(np.int64), index=rotulos[presentes])
+    quantidade = quantidade.sort_values(ascending=False)
+
+    return pd.DataFrame({
+        'Código': quantidade.index.to_numpy(),
+        'Quantidade': quantidade.to_numpy(),
+    })
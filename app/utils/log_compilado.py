@@ -0,0 +1,152 @@
+import hashlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from app.utils.cache import impressao_digital_arquivo
+
+# Compilações de data/logfinal.csv ficam em data/logfinal_compilado/<impressão digital do CSV>/
+SUFIXO_COMPILADO = '_compilado'
+
+
+def diretorio_compilado(caminho_csv):
+    """Diretório que guarda as compilações de um CSV (ao lado dele)."""
+    return os.path.splitext(caminho_csv)[0] + SUFIXO_COMPILADO
+
+
+def _compilacao_atual(destino):
+    # Compilações do formato anterior (dia.npy em datetime64[D]) não têm timestamp.npy e são refeitas
+    return os.path.isfile(os.path.join(destino, 'timestamp.npy'))
+
+
+def diretorio_da_versao(caminho_csv, diretorio=None):
+    """Diretório da compilação correspondente ao conteúdo atual do CSV."""
+    diretorio = diretorio or diretorio_compilado(caminho_csv)
+    return os.path.join(diretorio, impressao_digital_arquivo(caminho_csv))
+
+
+def ler_csv(caminho_csv):
+    """
+    Lê o log de eventos em CSV (id_discente, codigo, timestamp).
+
+    :param caminho_csv: Caminho do CSV ou buffer com o seu conteúdo.
+    :return: DataFrame com 'codigo' categórico e 'timestamp' em datetime64.
+    """
+    df = pd.read_csv(caminho_csv, dtype={'id_discente': np.int64, 'codigo': 'category'})
+    df['timestamp'] = pd.to_datetime(df['timestamp'], format='%Y-%m-%d')
+    return df
+
+
+def ler_csv_com_impressao(caminho_csv):
+    """
+    Lê o CSV uma única vez e calcula a impressão digital dos mesmos bytes interpretados, então
+    a impressão corresponde aos dados mesmo que o arquivo seja substituído durante a leitura.
+
+    :param caminho_csv: Caminho do CSV.
+    :return: (impressão digital sha256, DataFrame de ler_csv).
+    """
+    with open(caminho_csv, 'rb') as arquivo:
+        conteudo = arquivo.read()
+
+    return hashlib.sha256(conteudo).hexdigest(), ler_csv(io.BytesIO(conteudo))
+
+
+def compilar_log(caminho_csv, diretorio=None):
+    """
+    Compila o CSV para o formato binário colunar, se a versão atual ainda não foi compilada.
+
+    Um arquivo .npy por coluna, na ordem das linhas do CSV, já no dtype do DataFrame de ler_csv:
+    carregar_log monta o DataFrame sobre as próprias páginas do mmap, sem parsing nem cópia.
+    - id_discente.npy: ids dos alunos (int64).
+    - codigo.npy: código de atividade codificado por dicionário (códigos do Categorical do
+      pandas: int8 ou int16 conforme o número de categorias; -1 para vazio).
+    - categorias.npy: dicionário dos códigos de atividade (texto de largura fixa, ordenado).
+    - timestamp.npy: timestamp (datetime64[ns]).
+
+    Cada compilação fica em um subdiretório nomeado pela impressão digital do CSV: quando o CSV
+    muda, o subdiretório esperado não existe e o log é compilado de novo. O nome vem do hash dos
+    bytes efetivamente compilados (ver ler_csv_com_impressao), não de uma segunda leitura do
+    arquivo, então nome e conteúdo correspondem mesmo que o CSV seja trocado durante a
+    compilação. A escrita é feita em um diretório temporário renomeado ao final, então processos
+    concorrentes nunca leem uma compilação pela metade. Versões antigas do CSV e compilações no
+    formato anterior são removidas.
+
+    :param caminho_csv: Caminho do CSV de origem.
+    :param diretorio: Diretório que guarda as compilações; padrão: ao lado do CSV.
+    :return: Diretório da compilação.
+    """
+    diretorio = diretorio or diretorio_compilado(caminho_csv)
+    destino = diretorio_da_versao(caminho_csv, diretorio)
+    if _compilacao_atual(destino):
+        return destino
+
+    impressao, df = ler_csv_com_impressao(caminho_csv)
+    destino = os.path.join(diretorio, impressao)
+    if _compilacao_atual(destino):
+        return destino
+
+    os.makedirs(diretorio, exist_ok=True)
+    temporario = tempfile.mkdtemp(dir=diretorio, prefix='.compilando-')
+    try:
+        np.save(os.path.join(temporario, 'id_discente.npy'), df['id_discente'].to_numpy(dtype=np.int64))
+        np.save(os.path.join(temporario, 'codigo.npy'), df['codigo'].cat.codes.to_numpy())
+        np.save(os.path.join(temporario, 'categorias.npy'), df['codigo'].cat.categories.to_numpy().astype(str))
+        np.save(os.path.join(temporario, 'timestamp.npy'), df['timestamp'].to_numpy().astype('datetime64[ns]'))
+
+        # Compilação do mesmo CSV no formato anterior: sai do caminho antes da troca
+        if os.path.isdir(destino):
+            try:
+                os.rename(destino, os.path.join(tempfile.mkdtemp(dir=diretorio, prefix='.antigo-'), impressao))
+            except OSError:
+                pass
+        os.rename(temporario, destino)
+    except OSError:
+        shutil.rmtree(temporario, ignore_errors=True)
+        # Outro processo terminou a mesma compilação primeiro
+        if not _compilacao_atual(destino):
+            raise
+
+    # Remover compilações de versões anteriores do CSV
+    for nome in os.listdir(diretorio):
+        caminho = os.path.join(diretorio, nome)
+        if caminho != destino and (not nome.startswith('.') or nome.startswith('.antigo-')):
+            shutil.rmtree(caminho, ignore_errors=True)
+
+    return destino
+
+
+def carregar_log(destino):
+    """
+    Abre uma compilação com mmap e monta o DataFrame do log de eventos.
+
+    As colunas são vistas somente leitura das páginas do mmap (sem cópia): os workers que
+    carregam a mesma compilação compartilham essas páginas pelo cache de arquivos do sistema.
+    Quem precisar alterar uma coluna deve trabalhar sobre uma cópia (ex.: um filtro).
+
+    :param destino: Diretório da compilação (ver compilar_log).
+    :return: DataFrame igual ao de ler_csv para o mesmo CSV.
+    """
+    def abrir(nome):
+        # ndarray comum sobre as páginas do mmap (sem a subclasse np.memmap nos resultados)
+        return np.load(os.path.join(destino, nome), mmap_mode='r').view(np.ndarray)
+
+    categorias = pd.CategoricalDtype(pd.Index(np.load(os.path.join(destino, 'categorias.npy')).astype(object)))
+
+    return pd.DataFrame({
+        'id_discente': abrir('id_discente.npy'),
+        'codigo': pd.Categorical.from_codes(abrir('codigo.npy'), dtype=categorias),
+        'timestamp': abrir('timestamp.npy'),
+    }, copy=False)
+
+
+# Compilação offline: python -m app.utils.log_compilado [caminho_csv]
+if __name__ == '__main__':
+    from app.utils.registro import CAMINHO_LOG
+
+    caminho_csv = sys.argv[1] if len(sys.argv) > 1 else CAMINHO_LOG
+    print(f"Log compilado em {compilar_log(caminho_csv)}")
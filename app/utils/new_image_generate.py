@@ -1,10 +1,11 @@
+import numpy as np
 import pandas as pd
-import pygraphviz as pgv
 import matplotlib.colors as mcolors
 import matplotlib.pyplot as plt
 
-df_final = pd.read_csv('data/logfinal.csv')
-df_final['timestamp'] = pd.to_datetime(df_final['timestamp'], format='%Y-%m-%d')
+from app.utils.fluxograma import disciplinas, desenhar_fluxograma
+from app.utils.indice import tabela_contagem
+from app.utils.registro import obter_df_final, obter_indice, obter_matriz
 
 codigo_para_nome = {
 
@@ -67,6 +68,8 @@ def taxa_aprovacao_periodo(faixa_anos):
     if not isinstance(faixa_anos, list) or len(faixa_anos) != 2:
         raise ValueError("faixa_anos deve ser uma lista com dois elementos [ano_inicio, ano_fim].")
 
+    df_final = obter_df_final()
+
     # Filtrar o DataFrame para o intervalo de anos fornecido
     df_selecao = df_final[df_final['timestamp'].dt.year.between(faixa_anos[0], faixa_anos[1])].copy()
 
@@ -98,43 +101,18 @@ def calcular_taxa_aprovacao_primeira_vez(selecao):
     - total_aprovacoes: Série com o total de aprovações por disciplina.
     - total_alunos: Série com o total de alunos por disciplina.
     """
-    if isinstance(selecao, list):  # Faixa de anos
-        alunos_selecao = df_final[
-            (df_final['codigo'] == 'Iniciou') & 
-            (df_final['timestamp'].dt.year.between(selecao[0], selecao[1]))
-        ]['id_discente'].unique()
-    elif isinstance(selecao, int):  # Ano específico
-        alunos_selecao = df_final[
-            (df_final['codigo'] == 'Iniciou') & 
-            (df_final['timestamp'].dt.year == selecao)
-        ]['id_discente'].unique()
-    else:  # Todos os anos
-        alunos_selecao = df_final[
-            df_final['codigo'] == 'Iniciou'
-        ]['id_discente'].unique()
-
-    # Filtrar o DataFrame para os alunos e disciplinas relevantes
-    df_selecao = df_final[df_final['id_discente'].isin(alunos_selecao)].copy()
-
-    # Criar a coluna 'disciplina'
-    df_selecao.loc[:, 'disciplina'] = df_selecao['codigo'].str.split('_').str[0]
+    indice = obter_indice()
+    matriz = obter_matriz()
 
-    # Filtrar apenas as atividades relevantes (excluir "Iniciou" e "verificador")
-    disciplinas = df_selecao[~df_selecao['codigo'].isin(['Iniciou', 'verificador'])]
+    # Primeira tentativa de cada par (aluno, disciplina) dos alunos da seleção
+    alunos_selecao = indice.alunos_da_selecao(selecao)
+    alunos = matriz.somar(matriz.primeiro_resultado >= 0, alunos_selecao)
+    aprovacoes = matriz.somar(matriz.primeiro_resultado == matriz.codigo_resultado('APROVADO'), alunos_selecao)
+    presentes = alunos > 0
 
-    # Ordenar o DataFrame por aluno, disciplina e timestamp
-    disciplinas = disciplinas.sort_values(by=['id_discente', 'disciplina', 'timestamp'])
-
-    # Identificar a segunda ocorrência para cada aluno e disciplina
-    disciplinas['ocorrencia'] = disciplinas.groupby(['id_discente', 'disciplina']).cumcount() + 1
-    segunda_ocorrencia = disciplinas[disciplinas['ocorrencia'] == 2].copy()
-
-    # Verificar se essa segunda ocorrência foi uma aprovação
-    segunda_ocorrencia.loc[:, 'aprovado'] = segunda_ocorrencia['codigo'].str.contains('_APROVADO', na=False)
-
-    # Calcular total de aprovações e total de alunos por disciplina
-    total_aprovacoes = segunda_ocorrencia.groupby('disciplina')['aprovado'].sum()
-    total_alunos = segunda_ocorrencia.groupby('disciplina')['id_discente'].nunique()
+    index = pd.Index(indice.disciplinas[presentes], name='disciplina')
+    total_aprovacoes = pd.Series(aprovacoes[presentes], index=index, name='aprovado')
+    total_alunos = pd.Series(alunos[presentes], index=index, name='id_discente')
 
     return total_aprovacoes, total_alunos
 
@@ -148,54 +126,28 @@ def disciplinas_com_maior_gargalo(selecao=None):
     Retorno:
     - DataFrame: Gargalos por disciplina, nomes e quantidade em ordem decrescente, excluindo a atividade 'Iniciou'.
     """
-    global df_final, codigo_para_nome
-
-    # Filtrar alunos que não concluíram o curso (sem "verificador")
-    alunos_nao_concluidos = df_final[~df_final['id_discente'].isin(
-        df_final[df_final['codigo'] == 'verificador']['id_discente']
-    )]
-
-    # Criar uma nova coluna para extrair o código da disciplina
-    alunos_nao_concluidos = alunos_nao_concluidos.copy()
-    alunos_nao_concluidos['Código'] = alunos_nao_concluidos['codigo'].str.split('_').str[0]
-
-    # Selecione alunos com base na seleção
-    if isinstance(selecao, list):  # Faixa de anos
-        alunos_iniciaram_anos = df_final[
-            (df_final['codigo'] == 'Iniciou') & 
-            (df_final['timestamp'].dt.year.between(selecao[0], selecao[1]))
-        ]['id_discente']
-    elif isinstance(selecao, int):  # Ano específico
-        alunos_iniciaram_anos = df_final[
-            (df_final['codigo'] == 'Iniciou') & 
-            (df_final['timestamp'].dt.year == selecao)
-        ]['id_discente']
-    else:  # Todos os anos
-        alunos_iniciaram_anos = df_final[df_final['codigo'] == 'Iniciou']['id_discente']
-
-    alunos_nao_concluidos = alunos_nao_concluidos[
-        alunos_nao_concluidos['id_discente'].isin(alunos_iniciaram_anos)
-    ]
+    indice = obter_indice()
+    matriz = obter_matriz()
 
-    def identificar_gargalos(df):
-        """Identifica gargalos para cada aluno e disciplina."""
-        gargalos = []
-        for (id_discente, disciplina), grupo in df.groupby(['id_discente', 'Código']):
-            # Se não existe "_APROVADO" nas atividades da disciplina
-            if not grupo['codigo'].str.contains('_APROVADO').any():
-                gargalos.append({'id_discente': id_discente, 'Código': disciplina})
-        return pd.DataFrame(gargalos)
-
-    # Identificar os gargalos
-    gargalos = identificar_gargalos(alunos_nao_concluidos)
+    # Alunos da seleção que não concluíram o curso (sem "verificador")
+    linhas = np.flatnonzero(indice.alunos_da_selecao(selecao) & ~indice.formado)
 
     # Verificar se gargalos está vazio
-    if gargalos.empty:
+    if len(linhas) == 0:
         return pd.DataFrame(columns=['Código', 'Nome', 'Quantidade'])
 
-    # Contar os gargalos por disciplina e transformar em DataFrame
-    gargalos_por_disciplina = gargalos['Código'].value_counts().reset_index()
-    gargalos_por_disciplina.columns = ['Código', 'Quantidade']
+    # Gargalo: o aluno cursou a disciplina e nunca foi aprovado nela
+    gargalos = (matriz.cursou & ~matriz.aprovado)[linhas]
+
+    # Código 0 representa "Iniciou", contado para cada aluno e excluído adiante. A tabela segue a
+    # ordem de primeira ocorrência dos pares (aluno, código) ordenados, como em value_counts
+    contagem = np.concatenate([[len(linhas)], gargalos.sum(axis=0)])
+    presentes = np.flatnonzero(contagem)
+    primeiro_aluno = np.concatenate([[0], gargalos.argmax(axis=0)])[presentes]
+    presentes = presentes[np.lexsort((presentes, primeiro_aluno))]
+
+    rotulos = np.concatenate([['Iniciou'], indice.disciplinas]).astype(object)
+    gargalos_por_disciplina = tabela_contagem(contagem, presentes, rotulos)
 
     # Excluir a atividade "Iniciou"
     gargalos_por_disciplina = gargalos_por_disciplina[gargalos_por_disciplina['Código'] != 'Iniciou']
@@ -211,41 +163,34 @@ def disciplinas_com_maior_gargalo(selecao=None):
 
 def analisar_turma(ano_inicio=None):
 
-    # Filtrar alunos que iniciaram no ano especificado ou em todos os anos
-    if ano_inicio is not None:
-        alunos_iniciaram = df_final[(df_final['codigo'] == 'Iniciou') & (df_final['timestamp'].dt.year == ano_inicio)]
-    else:
-        alunos_iniciaram = df_final[df_final['codigo'] == 'Iniciou']
-    
-    alunos_iniciaram_ids = alunos_iniciaram['id_discente'].unique()
+    indice = obter_indice()
+
+    # Alunos que iniciaram no ano especificado ou em todos os anos
+    alunos_iniciaram = indice.alunos_da_selecao(ano_inicio)
 
-    # Filtrar alunos que se formaram (possui "verificador" na coluna 'codigo')
-    alunos_formados = df_final[(df_final['id_discente'].isin(alunos_iniciaram_ids)) & (df_final['codigo'] == 'verificador')]
-    formados_ids = alunos_formados['id_discente'].unique()
+    # Alunos que se formaram (possuem "verificador")
+    formados = alunos_iniciaram & indice.formado
 
-    # Filtrar alunos ativos (cursaram algo em 2023 e não possuem "verificador")
-    alunos_ativos = df_final[(df_final['id_discente'].isin(alunos_iniciaram_ids)) &
-                             (df_final['timestamp'].dt.year == 2023) &
-                             (~df_final['id_discente'].isin(formados_ids))]
-    ativos_ids = alunos_ativos['id_discente'].unique()
+    # Alunos ativos (cursaram algo no último ano do log e não possuem "verificador")
+    ativos = alunos_iniciaram & indice.ativo & ~indice.formado
 
-    # Filtrar alunos evadidos (não possuem "verificador" e não cursaram nada em 2023)
-    alunos_evadidos_ids = set(alunos_iniciaram_ids) - set(formados_ids) - set(ativos_ids)
+    # Alunos evadidos (não possuem "verificador" e não cursaram nada no último ano do log)
+    evadidos = alunos_iniciaram & ~formados & ~ativos
 
     # Gerar tabela com os resultados
 
     resultado2 = [
         {
             'Status': 'Formados',
-            'Quantidade': len(formados_ids),
+            'Quantidade': int(formados.sum()),
         },
         {
             'Status': 'Ativos',
-            'Quantidade': len(ativos_ids),
+            'Quantidade': int(ativos.sum()),
         },
         {
             'Status': 'Evadidos',
-            'Quantidade': len(alunos_evadidos_ids),
+            'Quantidade': int(evadidos.sum()),
         }
     ]
 
@@ -266,28 +211,21 @@ def disciplinas_com_mais_supressoes(selecao=None):
     - DataFrame: Disciplinas com supressões, nomes e quantidade em ordem decrescente.
     """
 
-    # Filtrar apenas os registros com supressão
-    supressoes = df_final[df_final['codigo'].str.contains('_SUPRIMIDO', na=False)].copy()
+    indice = obter_indice()
 
-    # Criar uma nova coluna para extrair o código da disciplina
-    supressoes['Código'] = supressoes['codigo'].str.split('_').str[0]
+    # Filtrar apenas os registros com supressão
+    supressoes = indice.eventos_com_resultado('_SUPRIMIDO')
 
     # Filtrar conforme o parâmetro `selecao`
     if selecao is not None:
         if isinstance(selecao, int):
             # Filtrar por ano específico (turma)
-            alunos_iniciaram = df_final[
-                (df_final['codigo'] == 'Iniciou') & 
-                (df_final['timestamp'].dt.year == selecao)
-            ]['id_discente'].unique()
-            supressoes = supressoes[supressoes['id_discente'].isin(alunos_iniciaram)]
+            supressoes = supressoes & indice.alunos_da_selecao(selecao)[indice.aluno]
 
         elif isinstance(selecao, list) and len(selecao) == 2:
-            print('aqui3')
             # Filtrar por faixa de anos (período)
             ano_inicio, ano_fim = selecao
-            print(ano_inicio, ano_fim)
-            supressoes = supressoes[supressoes['timestamp'].dt.year.between(ano_inicio, ano_fim)]
+            supressoes = supressoes & (indice.ano >= ano_inicio) & (indice.ano <= ano_fim)
 
         else:
             raise ValueError(
@@ -295,11 +233,10 @@ def disciplinas_com_mais_supressoes(selecao=None):
             )
 
     # Contar as supressões por disciplina
-    if supressoes.empty:
+    if not supressoes.any():
         return pd.DataFrame(columns=['Código', 'Nome', 'Quantidade'])
 
-    supressoes_por_disciplina = supressoes['Código'].value_counts().reset_index()
-    supressoes_por_disciplina.columns = ['Código', 'Quantidade']
+    supressoes_por_disciplina = indice.contar_por_disciplina(supressoes)
 
     # Adicionar a coluna 'Nome' com base no mapeamento
     supressoes_por_disciplina['Nome'] = supressoes_por_disciplina['Código'].map(codigo_para_nome)
@@ -326,26 +263,21 @@ def disciplinas_com_mais_trancamentos(selecao=None):
     - DataFrame: Disciplinas com trancamentos, nomes e quantidade em ordem decrescente.
     """
 
-    # Filtrar apenas os registros com trancamentos
-    trancamentos = df_final[df_final['codigo'].str.contains('_TRANCADO', na=False)].copy()
+    indice = obter_indice()
 
-    # Criar uma nova coluna para extrair o código da disciplina
-    trancamentos['Código'] = trancamentos['codigo'].str.split('_').str[0]
+    # Filtrar apenas os registros com trancamentos
+    trancamentos = indice.eventos_com_resultado('_TRANCADO')
 
     # Filtrar conforme o parâmetro `selecao`
     if selecao is not None:
         if isinstance(selecao, int):
             # Filtrar por ano específico (turma)
-            alunos_iniciaram = df_final[
-                (df_final['codigo'] == 'Iniciou') & 
-                (df_final['timestamp'].dt.year == selecao)
-            ]['id_discente'].unique()
-            trancamentos = trancamentos[trancamentos['id_discente'].isin(alunos_iniciaram)]
+            trancamentos = trancamentos & indice.alunos_da_selecao(selecao)[indice.aluno]
 
         elif isinstance(selecao, list) and len(selecao) == 2:
             # Filtrar por faixa de anos (período)
             ano_inicio, ano_fim = selecao
-            trancamentos = trancamentos[trancamentos['timestamp'].dt.year.between(ano_inicio, ano_fim)]
+            trancamentos = trancamentos & (indice.ano >= ano_inicio) & (indice.ano <= ano_fim)
 
         else:
             raise ValueError(
@@ -353,11 +285,10 @@ def disciplinas_com_mais_trancamentos(selecao=None):
             )
 
     # Contar os trancamentos por disciplina
-    if trancamentos.empty:
+    if not trancamentos.any():
         return pd.DataFrame(columns=['Código', 'Nome', 'Quantidade'])
 
-    trancamentos_por_disciplina = trancamentos['Código'].value_counts().reset_index()
-    trancamentos_por_disciplina.columns = ['Código', 'Quantidade']
+    trancamentos_por_disciplina = indice.contar_por_disciplina(trancamentos)
 
     # Adicionar a coluna 'Nome' com base no mapeamento
     trancamentos_por_disciplina['Nome'] = trancamentos_por_disciplina['Código'].map(codigo_para_nome)
@@ -367,63 +298,116 @@ def disciplinas_com_mais_trancamentos(selecao=None):
     return trancamentos_por_disciplina
 
 
-def consolidar_metricas(selecao=None):
+# Métricas exibidas no fluxograma por visualizar_disciplinas_por_metrica
+TIPOS_METRICA = ["taxa_aprovacao", "gargalo", "supressao", "trancamento"]
+
+
+def calcular_metricas(selecao=None, tipos=None):
     """
-    Consolida as métricas de gargalo, taxa de aprovação, supressões e trancamentos em uma única tabela.
+    Calcula as métricas por disciplina de uma seleção, cada uma uma única vez, para serem
+    compartilhadas entre os fluxogramas de métricas e a tabela consolidada.
 
     Parâmetros:
-    - df_final: DataFrame com os dados de disciplinas e alunos.
     - selecao: Ano específico (int), faixa de anos (list) ou None (todos os anos).
+    - tipos: Métricas desejadas entre "taxa_aprovacao", "aprovacao_primeira_vez", "gargalo",
+      "supressao" e "trancamento"; None calcula todas.
 
     Retorno:
-    - DataFrame consolidado com as colunas:
-        - Código: Código da disciplina.
-        - Nome: Nome da disciplina.
-        - Gargalo: Número de alunos que enfrentaram gargalos (inteiro).
-        - Taxa de Aprovação (%): Porcentagem de aprovação (2 casas decimais).
-        - Supressões: Número de supressões na disciplina (inteiro).
-        - Trancamentos: Número de trancamentos na disciplina (inteiro).
+    - Dicionário tipo -> resultado. "taxa_aprovacao" e "aprovacao_primeira_vez" são tuplas
+      (total_aprovacoes, total_alunos); as demais são DataFrames com Código, Nome e Quantidade.
     """
-    
-    # Calcular métricas individuais
-    gargalos_por_disciplina = disciplinas_com_maior_gargalo(selecao)
-    supressoes_por_disciplina = disciplinas_com_mais_supressoes(selecao)
-    trancamentos_por_disciplina = disciplinas_com_mais_trancamentos(selecao)
-    total_aprovacoes, alunos_por_disciplina = calcular_taxa_aprovacao_primeira_vez(selecao)
-
-    # Taxa de aprovação em porcentagem
-    taxa_aprovacao = ((total_aprovacoes / alunos_por_disciplina) * 100).fillna(0).reset_index()
-    taxa_aprovacao.columns = ['Código', 'Taxa de Aprovação (%)']
-
-    # Garantir que a coluna Nome esteja em todos os DataFrames
-    gargalos_por_disciplina = gargalos_por_disciplina.rename(columns={'Quantidade': 'Gargalo'})
-    supressoes_por_disciplina = supressoes_por_disciplina.rename(columns={'Quantidade': 'Supressões'})
-    trancamentos_por_disciplina = trancamentos_por_disciplina.rename(columns={'Quantidade': 'Trancamentos'})
-
-    # Criar a coluna Nome com base no mapeamento, se necessário
-    gargalos_por_disciplina['Nome'] = gargalos_por_disciplina['Código'].map(codigo_para_nome)
-    supressoes_por_disciplina['Nome'] = supressoes_por_disciplina['Código'].map(codigo_para_nome)
-    trancamentos_por_disciplina['Nome'] = trancamentos_por_disciplina['Código'].map(codigo_para_nome)
-    taxa_aprovacao['Nome'] = taxa_aprovacao['Código'].map(codigo_para_nome)
+    por_periodo = isinstance(selecao, list) and len(selecao) == 2
+
+    calculos = {
+        "aprovacao_primeira_vez": calcular_taxa_aprovacao_primeira_vez,
+        # O fluxograma de taxa de aprovação usa as aprovações do período quando a seleção é uma faixa
+        "taxa_aprovacao": taxa_aprovacao_periodo if por_periodo else calcular_taxa_aprovacao_primeira_vez,
+        "gargalo": disciplinas_com_maior_gargalo,
+        "supressao": disciplinas_com_mais_supressoes,
+        "trancamento": disciplinas_com_mais_trancamentos,
+    }
+
+    # Métricas que usam o mesmo cálculo o executam uma única vez
+    resultados = {}
+    metricas = {}
+    for tipo in tipos or calculos:
+        calcular = calculos[tipo]
+        if calcular not in resultados:
+            resultados[calcular] = calcular(selecao)
+        metricas[tipo] = resultados[calcular]
+
+    return metricas
+
+
+def consolidar_registros(selecao=None):
+    """
+    Calcula a tabela consolidada por disciplina sem DataFrames intermediários, merges ou
+    serialização JSON (a implementação anterior, consolidar_metricas, está em benchmark_consolidacao.py).
+
+    Cada métrica é uma soma por coluna da matriz aluno × disciplina sobre os alunos da
+    seleção; apenas supressões e trancamentos de uma faixa (eventos do período) são contados
+    diretamente sobre os eventos.
 
-    # Mesclar os resultados em uma única tabela
-    consolidado = pd.merge(gargalos_por_disciplina, taxa_aprovacao, on=['Código', 'Nome'], how='outer')
-    consolidado = pd.merge(consolidado, supressoes_por_disciplina, on=['Código', 'Nome'], how='outer')
-    consolidado = pd.merge(consolidado, trancamentos_por_disciplina, on=['Código', 'Nome'], how='outer')
+    Parâmetros:
+    - selecao: Ano específico (int), faixa de anos (list) ou None (todos os anos).
 
-    # Preencher valores NaN com 0 (para disciplinas sem dados em alguma métrica)
-    consolidado = consolidado.fillna(0)
+    Retorno:
+    - Lista de registros (dicts) com Código, Nome, Gargalo, Taxa de Aprovação (%), Supressões e
+      Trancamentos, ordenada por Código; os mesmos valores de json.loads(consolidar_metricas(selecao)).
+    """
+    indice = obter_indice()
+    matriz = obter_matriz()
+    num_disciplinas = len(indice.disciplinas)
+    alunos_selecao = indice.alunos_da_selecao(selecao)
+
+    # Gargalo: alunos não formados que cursaram a disciplina e nunca foram aprovados nela
+    gargalo = matriz.somar(matriz.cursou & ~matriz.aprovado, alunos_selecao & ~indice.formado)
+
+    # Taxa de aprovação: a primeira tentativa (segundo evento do par) foi uma aprovação
+    alunos = matriz.somar(matriz.primeiro_resultado >= 0, alunos_selecao)
+    aprovacoes = matriz.somar(matriz.primeiro_resultado == matriz.codigo_resultado('APROVADO'), alunos_selecao)
+    taxa = np.zeros(num_disciplinas)
+    np.divide(aprovacoes * 100, alunos, out=taxa, where=alunos > 0)
+    taxa = np.round(taxa, 2)
+
+    # Supressões e trancamentos: turma para um ano, eventos do período para uma faixa
+    if selecao is None:
+        supressoes = matriz.somar(matriz.supressoes)
+        trancamentos = matriz.somar(matriz.trancamentos)
+    elif isinstance(selecao, int):
+        supressoes = matriz.somar(matriz.supressoes, alunos_selecao)
+        trancamentos = matriz.somar(matriz.trancamentos, alunos_selecao)
+    elif isinstance(selecao, list) and len(selecao) == 2:
+        # O ano de cada evento não está na matriz: contagem direta sobre os eventos do período
+        eventos = (indice.ano >= selecao[0]) & (indice.ano <= selecao[1])
+        supressoes = np.bincount(
+            indice.disciplina[eventos & indice.eventos_com_resultado('_SUPRIMIDO')], minlength=num_disciplinas)
+        trancamentos = np.bincount(
+            indice.disciplina[eventos & indice.eventos_com_resultado('_TRANCADO')], minlength=num_disciplinas)
+    else:
+        raise ValueError(
+            "Selecao deve ser None, um inteiro (ano específico), ou uma lista com dois elementos [ano_inicio, ano_fim]."
+        )
 
-    # Garantir tipos adequados para cada coluna
-    consolidado['Gargalo'] = consolidado['Gargalo'].astype(int)
-    consolidado['Supressões'] = consolidado['Supressões'].astype(int)
-    consolidado['Trancamentos'] = consolidado['Trancamentos'].astype(int)
-    consolidado['Taxa de Aprovação (%)'] = consolidado['Taxa de Aprovação (%)'].round(2)
+    # Disciplinas presentes em alguma das métricas, em ordem de código
+    presentes = np.flatnonzero((gargalo > 0) | (alunos > 0) | (supressoes > 0) | (trancamentos > 0))
 
-    # Reordenar as colunas
-    consolidado = consolidado[['Código', 'Nome', 'Gargalo', 'Taxa de Aprovação (%)', 'Supressões', 'Trancamentos']]
+    return [
+        {
+            'Código': indice.disciplinas[d],
+            # Códigos sem nome ficam com 0, como no fillna(0) de consolidar_metricas
+            'Nome': codigo_para_nome.get(indice.disciplinas[d], 0),
+            'Gargalo': int(gargalo[d]),
+            'Taxa de Aprovação (%)': float(taxa[d]),
+            'Supressões': int(supressoes[d]),
+            'Trancamentos': int(trancamentos[d]),
+        }
+        for d in presentes
+    ]
+
+# Espessura adicional da aresta com mais semestres de atraso (as demais são proporcionais)
+ESPESSURA_MAXIMA_ATRASO = 6
 
-    return consolidado.to_json(orient='records')
 
 class ReverseNormalize(mcolors.Normalize):
     """Normalizador para inverter o mapeamento de cores."""
@@ -437,6 +421,8 @@ def visualizar_disciplinas_por_metrica(
     selecao=None,
     tipo_visualizacao="taxa_aprovacao",
     cmap_nome="RdYlGn",
+    metricas=None,
+    atrasos=None,
 ):
     """
     Função genérica para visualizar disciplinas com base em métricas, como taxa de aprovação, gargalo ou supressão.
@@ -446,126 +432,59 @@ def visualizar_disciplinas_por_metrica(
     - tipo_visualizacao: "taxa_aprovacao", "gargalo" ou "supressao".
     - cmap_nome: Nome do colormap a ser usado.
     - titulo: Título do gráfico.
+    - metricas: Resultado de calcular_metricas(selecao) já calculado, se houver.
+    - atrasos: Lista 'arestas' de atrasos_por_pre_requisito(selecao); se informada, a espessura de
+      cada pré-requisito é proporcional aos semestres de atraso que ele transmitiu.
+
+    Retorno:
+    - Bytes da imagem PNG.
     """
+    if tipo_visualizacao not in TIPOS_METRICA:
+        raise ValueError("Tipo de visualização inválido. Use 'taxa_aprovacao', 'gargalo', 'supressao' ou trancamento.")
+
+    if metricas is None:
+        metricas = calcular_metricas(selecao, [tipo_visualizacao])
+
     if tipo_visualizacao == "taxa_aprovacao":
-        if isinstance(selecao, list) and len(selecao) == 2:  # Por período
-            total_aprovacoes, alunos_por_disciplina = taxa_aprovacao_periodo(selecao)
-            valores = (total_aprovacoes / alunos_por_disciplina).fillna(0)  # Taxa de aprovação
-        else:
-            total_aprovacoes, alunos_por_disciplina = calcular_taxa_aprovacao_primeira_vez(selecao)
-            valores = (total_aprovacoes / alunos_por_disciplina).fillna(0)  # Taxa de aprovação
+        # Por período para faixas de anos, primeira vez para ano ou todos os anos
+        total_aprovacoes, alunos_por_disciplina = metricas["taxa_aprovacao"]
+        valores = (total_aprovacoes / alunos_por_disciplina).fillna(0)  # Taxa de aprovação
         norm = mcolors.Normalize(vmin=valores.min(), vmax=valores.max())
-    elif tipo_visualizacao in ["gargalo", "supressao", "trancamento"]:
-        if tipo_visualizacao == "gargalo":
-            gargalos_por_disciplina = disciplinas_com_maior_gargalo(selecao)
-            valores = pd.Series(
-                gargalos_por_disciplina['Quantidade'].values,
-                index=gargalos_por_disciplina['Código']
-            )
-        elif tipo_visualizacao == "supressao":
+    else:
+        quantidades = metricas[tipo_visualizacao]
+        valores = pd.Series(
+            quantidades['Quantidade'].values,
+            index=quantidades['Código']
+        )
 
-            supressoes_por_disciplina = disciplinas_com_mais_supressoes(selecao)
-            valores = pd.Series(
-                supressoes_por_disciplina['Quantidade'].values,
-                index=supressoes_por_disciplina['Código']
-            )
-        elif tipo_visualizacao == "trancamento":
-            print("cheguei aqu2")
-            trancamentos_por_disciplina = disciplinas_com_mais_trancamentos(selecao)
-            valores = pd.Series(
-                trancamentos_por_disciplina['Quantidade'].values,
-                index=trancamentos_por_disciplina['Código']
-            )
-            
-        # Normalização inversa para "gargalo" e "supressão"
+        # Normalização inversa para "gargalo", "supressão" e "trancamento"
         norm = ReverseNormalize(vmin=valores.min(), vmax=valores.max())
-    else:
-        raise ValueError("Tipo de visualização inválido. Use 'taxa_aprovacao', 'gargalo', 'supressao' ou trancamento.")
 
     # Configuração do colormap
     cmap = plt.get_cmap(cmap_nome)
 
-    # Disciplinas organizadas por blocos
-    disciplinas = [
-        ["QXD0001", "QXD0108", "QXD0005", "QXD0109", "QXD0103", "QXD0056"],
-        ["QXD0007", "QXD0010", "QXD0013", "QXD0006", "QXD0008"],
-        ["QXD0115", "QXD0017", "QXD0114", "QXD0012", "QXD0040"],
-        ["QXD0011", "QXD0014", "QXD0016", "QXD0041", "QXD0116"],
-        ["QXD0020", "QXD0021", "QXD0025", "QXD0119", "QXD0120"],
-        ["QXD0019", "QXD0037", "QXD0038", "QXD0043", "QXD0046"],
-        ["QXD0029", "QXD0110"],
-    ]
-
-    transicoes = {
-        "QXD0001": ["QXD0007", "QXD0010"],
-        "QXD0005": ["QXD0013"],
-        "QXD0056": ["QXD0008", "QXD0012"],
-        "QXD0109": ["QXD0006"],
-        "QXD0007": ["QXD0016", "QXD0020", "QXD0014", "QXD0019"],
-        "QXD0010": ["QXD0115", "QXD0041"],
-        "QXD0008": ["QXD0040", "QXD0041"],
-        "QXD0013": ["QXD0043"],
-        "QXD0116": ["QXD0119", "QXD0120"],
-        "QXD0046": ["QXD0110"],
-    }
-
-    # Criar o gráfico
-    G = pgv.AGraph(strict=False, directed=True, rankdir='TB')
-    G.graph_attr['splines'] = 'ortho'
-    G.graph_attr['nodesep'] = '0.6'
-    G.graph_attr['ranksep'] = '0.7'
-
-    subgraphs = []
-    for i, linha in enumerate(disciplinas):
-        with G.subgraph(name="cluster_" + str(i)) as s:
-            s.graph_attr['rank'] = 'same'
-            s.graph_attr['color'] = 'transparent'
-            for disciplina in linha:
-                valor = valores.get(disciplina, 0)
-                cor = mcolors.to_hex(cmap(norm(valor)))
-                nome_disciplina = codigo_para_nome.get(disciplina, "Desconhecido")
-                if tipo_visualizacao == "taxa_aprovacao":
-                    label = f"{disciplina} \n {nome_disciplina}\n{valor*100:.2f}%"
-                elif tipo_visualizacao == "gargalo":
-                    label = f"{disciplina} \n {nome_disciplina}\n{int(valor)} alunos"
-                elif tipo_visualizacao == "supressao":
-                    label = f"{disciplina} \n {nome_disciplina}\n{int(valor)} supressões"
-                elif tipo_visualizacao == "trancamento":
-                    label = f"{disciplina} \n {nome_disciplina}\n{int(valor)} trancamentos"
-                s.add_node(
-                    disciplina,
-                    shape='box',
-                    style='filled',
-                    fillcolor=cor,
-                    fontsize=19,  # Font size padrão para fallback
-                    fontname='Arial',  # Fonte principal
-                    label=label,  # Label formatado com HTML-like
-                    fixedsize=True,
-                    width=3,
-                    height=1.8
-                )
-            subgraphs.append(s)
-
-    # Adicionar transições (arestas)
-    for origem, destinos in transicoes.items():
-        for destino in destinos:
-            G.add_edge(origem, destino, directed=True, arrowhead='normal', constraint=False)
-
-    # Adicionar arestas invisíveis para alinhar blocos
-    for i in range(len(subgraphs) - 1):
-        node1 = list(subgraphs[i].nodes())[0]
-        node2 = list(subgraphs[i + 1].nodes())[0]
-        G.add_edge(node1, node2, style='invis', weight=10)
-
-    # Nome do arquivo
-    if isinstance(selecao, (list, tuple)) and len(selecao) == 2:
-        nome_arquivo = f"visualizacao_{tipo_visualizacao}_{selecao[0]}_{selecao[1]}.png"
-    elif isinstance(selecao, int):
-        nome_arquivo = f"visualizacao_{tipo_visualizacao}_{selecao}.png"
-    else:
-        nome_arquivo = f"visualizacao_{tipo_visualizacao}_todos_os_anos.png"
-
-    G.layout(prog='dot')
-    G.draw('app/images/{}'.format(nome_arquivo))
+    cores = {}
+    rotulos = {}
+    for linha in disciplinas:
+        for disciplina in linha:
+            valor = valores.get(disciplina, 0)
+            cores[disciplina] = mcolors.to_hex(cmap(norm(valor)))
+            nome_disciplina = codigo_para_nome.get(disciplina, "Desconhecido")
+            if tipo_visualizacao == "taxa_aprovacao":
+                rotulos[disciplina] = f"{disciplina} \n {nome_disciplina}\n{valor*100:.2f}%"
+            elif tipo_visualizacao == "gargalo":
+                rotulos[disciplina] = f"{disciplina} \n {nome_disciplina}\n{int(valor)} alunos"
+            elif tipo_visualizacao == "supressao":
+                rotulos[disciplina] = f"{disciplina} \n {nome_disciplina}\n{int(valor)} supressões"
+            elif tipo_visualizacao == "trancamento":
+                rotulos[disciplina] = f"{disciplina} \n {nome_disciplina}\n{int(valor)} trancamentos"
+
+    espessuras = None
+    if atrasos:
+        maior_atraso = max(aresta['atraso'] for aresta in atrasos)
+        espessuras = {
+            (aresta['origem'], aresta['destino']): 1 + ESPESSURA_MAXIMA_ATRASO * aresta['atraso'] / maior_atraso
+            for aresta in atrasos
+        }
 
-    return nome_arquivo
+    return desenhar_fluxograma(cores, rotulos, espessuras=espessuras)
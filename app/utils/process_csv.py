@@ -1,6 +1,30 @@
 from datetime import datetime
+import math
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
 import pandas as pd
 
+# Lista de códigos obrigatórios
+CODIGOS_OBRIGATORIOS = [
+    "QXD0001", "QXD0005", "QXD0056", "QXD0103", "QXD0108", "QXD0109",
+    "QXD0006", "QXD0007", "QXD0008", "QXD0010", "QXD0013",
+    "QXD0012", "QXD0017", "QXD0040", "QXD0114", "QXD0115",
+    "QXD0011", "QXD0014", "QXD0016", "QXD0041", "QXD0116",
+    "QXD0020", "QXD0021", "QXD0025", "QXD0119", "QXD0120",
+    "QXD0019", "QXD0037", "QXD0038", "QXD0221", "QXD0043", "QXD0046",
+    "QXD0029", "QXD0110",
+]
+
+# Número mínimo de disciplinas aprovadas para o aluno receber o evento "verificador"
+MIN_APROVACOES_VERIFICADOR = 33
+
+# Tamanho aproximado, em bytes do CSV bruto, de cada partição processada em memória por processar_csv_em_blocos
+BYTES_POR_PARTICAO = 16 * 1024 * 1024
+
 def processar_csv(df):
     """
     Processa um DataFrame contendo dados acadêmicos, aplicando as transformações necessárias:
@@ -22,19 +46,8 @@ def processar_csv(df):
     df.loc[:, 'ano'] = pd.to_numeric(df['ano'], errors='coerce')
     df = df[df['ano'] < 2024]
 
-    # Lista de códigos obrigatórios
-    codigos_obrigatorios = [
-        "QXD0001", "QXD0005", "QXD0056", "QXD0103", "QXD0108", "QXD0109",
-        "QXD0006", "QXD0007", "QXD0008", "QXD0010", "QXD0013",
-        "QXD0012", "QXD0017", "QXD0040", "QXD0114", "QXD0115",
-        "QXD0011", "QXD0014", "QXD0016", "QXD0041", "QXD0116",
-        "QXD0020", "QXD0021", "QXD0025", "QXD0119", "QXD0120",
-        "QXD0019", "QXD0037", "QXD0038", "QXD0221", "QXD0043", "QXD0046",
-        "QXD0029", "QXD0110",
-    ]
-
     # Filtrar apenas disciplinas obrigatórias
-    df = df[df['codigo'].isin(codigos_obrigatorios)]
+    df = df[df['codigo'].isin(CODIGOS_OBRIGATORIOS)]
 
     # Substituir código 'QXD0221' por 'QXD0038'
     df['codigo'] = df['codigo'].replace('QXD0221', 'QXD0038')
@@ -68,7 +81,7 @@ def processar_csv(df):
     # Filtrar alunos com pelo menos 33 aprovações
     alunos_aprovados = df_final[df_final['codigo'].str.contains("_APROVADO", na=False)]
     alunos_com_mais_33 = alunos_aprovados.groupby('id_discente')['codigo'].nunique()
-    alunos_com_mais_33 = alunos_com_mais_33[alunos_com_mais_33 >= 33].index
+    alunos_com_mais_33 = alunos_com_mais_33[alunos_com_mais_33 >= MIN_APROVACOES_VERIFICADOR].index
 
     # Criar eventos 'Verificador'
     df_verificadores = pd.DataFrame([
@@ -92,3 +105,162 @@ def processar_csv(df):
     df_final = df_final.rename(columns={'codigo': 'activity'})
 
     return df_final
+
+
+def _datas_do_periodo(ano, periodo, mes_primeiro, mes_segundo):
+    """Primeiro dia de `mes_primeiro` (período 1) ou `mes_segundo` (demais) do ano, vetorizado."""
+    meses = (ano - 1970) * 12 + np.where(periodo == 1, mes_primeiro, mes_segundo) - 1
+    return pd.Series(meses.astype('datetime64[M]').astype('datetime64[ns]'), index=ano.index)
+
+
+def _eventos_do_bloco(bloco):
+    """
+    Aplica a um bloco já sem duplicatas os filtros e ajustes de processar_csv, com datas vetorizadas.
+
+    :param bloco: DataFrame bruto (id_discente, codigo, resultado, periodo, ano, ...).
+    :return: DataFrame de eventos com id_discente, codigo e timestamp.
+    """
+    ano = pd.to_numeric(bloco['ano'], errors='coerce')
+    bloco = bloco[(ano < 2024) & bloco['codigo'].isin(CODIGOS_OBRIGATORIOS)]
+    ano = ano[bloco.index].astype(np.int64)
+    periodo = pd.to_numeric(bloco['periodo'], errors='coerce').to_numpy()
+
+    codigo = bloco['codigo'].replace('QXD0221', 'QXD0038')
+    resultado = bloco['resultado'].str.replace('REP. FALTA', 'REPFALTA', regex=False)
+
+    # Inscrição no início do período (fevereiro/agosto) e resultado no fim (junho/dezembro)
+    inscricoes = pd.DataFrame({
+        'id_discente': bloco['id_discente'],
+        'codigo': codigo,
+        'timestamp': _datas_do_periodo(ano, periodo, 2, 8),
+    })
+    resultados = pd.DataFrame({
+        'id_discente': bloco['id_discente'],
+        'codigo': codigo + '_' + resultado.str.replace(' ', '', regex=False),
+        'timestamp': _datas_do_periodo(ano, periodo, 6, 12),
+    })
+
+    return pd.concat([inscricoes, resultados], ignore_index=True)
+
+
+def _eventos_dos_alunos(eventos):
+    """
+    Eventos "verificador" e "Iniciou" dos alunos, a partir de todos os eventos de cada aluno.
+
+    :param eventos: Eventos (id_discente, codigo, timestamp) completos dos alunos envolvidos.
+    :return: DataFrame com os eventos "verificador" seguidos dos eventos "Iniciou".
+    """
+    codigos_aprovacao = [f'{codigo}_APROVADO' for codigo in set(CODIGOS_OBRIGATORIOS) - {'QXD0221'}]
+
+    # Evento "verificador": um dia após a última aprovação de quem tem aprovações suficientes
+    aprovacoes = eventos[eventos['codigo'].isin(codigos_aprovacao)]
+    por_aluno = aprovacoes.groupby('id_discente').agg(
+        aprovadas=('codigo', 'nunique'),
+        ultima_aprovacao=('timestamp', 'max'),
+    )
+    formados = por_aluno[por_aluno['aprovadas'] >= MIN_APROVACOES_VERIFICADOR]
+    verificadores = pd.DataFrame({
+        'id_discente': formados.index,
+        'codigo': 'verificador',
+        'timestamp': formados['ultima_aprovacao'].to_numpy() + pd.Timedelta(days=1),
+    })
+
+    # Evento "Iniciou": um mês antes do primeiro evento, ou 1º de janeiro se ele já é em janeiro
+    primeiro_evento = eventos.groupby('id_discente')['timestamp'].min()
+    mes_anterior = primeiro_evento - pd.DateOffset(months=1)
+    inicio_ano = primeiro_evento.dt.to_period('Y').dt.to_timestamp()
+    iniciou = pd.DataFrame({
+        'id_discente': primeiro_evento.index,
+        'codigo': 'Iniciou',
+        'timestamp': mes_anterior.where(primeiro_evento.dt.month > 1, inicio_ano).to_numpy(),
+    })
+
+    return pd.concat([verificadores, iniciou], ignore_index=True)
+
+
+def _particionar(caminho_entrada, diretorio, particoes, tamanho_bloco, opcoes_leitura):
+    """
+    Primeira passagem: distribui as linhas brutas em `particoes` arquivos pelo hash do id_discente.
+
+    :return: Caminhos dos arquivos de partição criados.
+    """
+    caminhos = {}
+
+    # Tudo como texto: linhas brutas iguais continuam iguais após a ida e volta pelo disco
+    leitor = pd.read_csv(caminho_entrada, dtype=str, chunksize=tamanho_bloco, **opcoes_leitura)
+    for bloco in leitor:
+        particao = pd.util.hash_pandas_object(bloco['id_discente'], index=False).to_numpy() % particoes
+        for i, parte in bloco.groupby(particao):
+            if i not in caminhos:
+                caminhos[i] = os.path.join(diretorio, f'particao_{i}.csv')
+            parte.to_csv(caminhos[i], mode='a', header=not os.path.exists(caminhos[i]), index=False)
+
+    return [caminhos[i] for i in sorted(caminhos)]
+
+
+def processar_csv_em_blocos(caminho_entrada, caminho_saida, tamanho_bloco=500_000, particoes=None, **opcoes_leitura):
+    """
+    Versão em streaming de processar_csv: grava o log de eventos (id_discente, codigo, timestamp
+    no formato de data/logfinal.csv) a partir de uma exportação bruta maior que a memória.
+
+    Em duas passagens com memória limitada:
+    1. A exportação é lida em blocos de `tamanho_bloco` linhas e cada linha vai para um arquivo
+       temporário de partição, escolhido pelo hash do id_discente.
+    2. Cada partição é processada inteira em memória: todas as linhas de um aluno, e portanto
+       todas as suas duplicatas, estão na mesma partição, então a remoção de duplicatas e os
+       eventos "verificador" e "Iniciou" são exatos sem nenhum estado entre partições.
+
+    A memória usada depende do tamanho do bloco e do tamanho de uma partição (o CSV bruto
+    dividido por `particoes`), não do número de linhas da exportação.
+
+    Diferente de processar_csv, as linhas não são ordenadas globalmente: cada partição grava seus
+    eventos na ordem da exportação, seguidos dos eventos "verificador" e "Iniciou" dos seus
+    alunos. Os consumidores do log (pm4py, agrupar_variantes) ordenam por aluno e timestamp.
+    O arquivo de saída só é substituído ao final, então quem o lê nunca vê um log pela metade.
+
+    :param caminho_entrada: CSV bruto com as colunas id_discente, codigo, resultado, periodo e ano.
+    :param caminho_saida: CSV de saída do log de eventos.
+    :param tamanho_bloco: Número de linhas brutas lidas por vez na primeira passagem.
+    :param particoes: Número de partições; padrão: uma a cada BYTES_POR_PARTICAO do CSV bruto.
+    :param opcoes_leitura: Opções adicionais para pd.read_csv da exportação (ex.: sep, encoding).
+    :return: Número de eventos gravados.
+    """
+    if particoes is None:
+        particoes = max(1, math.ceil(os.path.getsize(caminho_entrada) / BYTES_POR_PARTICAO))
+
+    diretorio_saida = os.path.dirname(os.path.abspath(caminho_saida))
+    total = 0
+
+    with tempfile.TemporaryDirectory(dir=diretorio_saida, prefix='.particoes-') as diretorio:
+        caminhos = _particionar(caminho_entrada, diretorio, particoes, tamanho_bloco, opcoes_leitura)
+
+        temporario = os.path.join(diretorio, 'logfinal.csv')
+        with open(temporario, 'w', newline='') as saida:
+            saida.write('id_discente,codigo,timestamp\n')
+
+            for caminho in caminhos:
+                eventos = _eventos_do_bloco(pd.read_csv(caminho, dtype=str).drop_duplicates())
+                if eventos.empty:
+                    continue
+
+                for parte in (eventos, _eventos_dos_alunos(eventos)):
+                    parte.to_csv(saida, header=False, index=False, date_format='%Y-%m-%d')
+                    total += len(parte)
+
+                # Partição já gravada: o disco temporário é liberado durante o processamento
+                os.remove(caminho)
+
+        os.replace(temporario, caminho_saida)
+
+    return total
+
+
+# Regeração do log a partir da exportação bruta:
+# python -m app.utils.process_csv <exportacao.csv> [saida, padrão data/logfinal.csv]
+if __name__ == '__main__':
+    from app.utils.registro import CAMINHO_LOG
+
+    caminho_saida = sys.argv[2] if len(sys.argv) > 2 else CAMINHO_LOG
+    inicio = time.perf_counter()
+    total = processar_csv_em_blocos(sys.argv[1], caminho_saida)
+    print(f"{total} eventos gravados em {caminho_saida} em {time.perf_counter() - inicio:.1f} s")
@@ -0,0 +1,283 @@
+import contextvars
+import logging
+import os
+import threading
+import time
+
+from pm4py.objects.petri_net.importer import importer as pnml_importer
+
+from app.utils.cache import impressao_digital_arquivo
+from app.utils.indice import IndiceLog, MatrizAlunoDisciplina
+from app.utils.log_compilado import carregar_log, compilar_log, ler_csv_com_impressao
+from app.utils.replay_numpy import RedeCompilada
+
+logger = logging.getLogger(__name__)
+
+CAMINHO_LOG = 'data/logfinal.csv'
+CAMINHO_REDE = 'data/MODELAGEMCOMPLETACC_sem_reprovacoes.pnml'
+
+# Recursos carregados sob demanda e compartilhados por todos os módulos do processo
+_recursos = {}
+_lock = threading.RLock()
+
+# Versão do log de eventos em uso; substituída por inteiro (nunca alterada) a cada recarga
+_versao_log = None
+_lock_recarga = threading.Lock()
+
+# Versão fixada no primeiro acesso de cada requisição (ver fixar_versao)
+_versao_da_requisicao = contextvars.ContextVar('versao_da_requisicao', default=None)
+
+# Funções chamadas após cada recarga, com a nova versão fixada (ex.: aquecimento de caches)
+_ao_recarregar = []
+
+_observador = None
+_intervalo_observador = None
+
+
+class VersaoLog:
+    """
+    Uma versão carregada do log de eventos: impressão digital, DataFrame, índice colunar e
+    matriz aluno × disciplina.
+    """
+
+    def __init__(self, impressao, df_final):
+        self.impressao = impressao
+        self.df_final = df_final
+        self.indice = IndiceLog(df_final)
+        self.matriz = MatrizAlunoDisciplina(self.indice)
+
+
+def _carregar_uma_vez(nome, carregar):
+    """Executa `carregar()` na primeira chamada para `nome` e reaproveita o resultado nas seguintes."""
+    if nome not in _recursos:
+        with _lock:
+            if nome not in _recursos:
+                _recursos[nome] = carregar()
+
+    return _recursos[nome]
+
+
+def _ler_log():
+    # Colunas em buffers NumPy contíguos: 'codigo' é categórica (códigos inteiros + categorias
+    # distintas) em vez de uma string Python por evento, cujas contagens de referência
+    # desfariam o compartilhamento de páginas entre workers após o fork.
+    # O DataFrame é montado sobre o mmap da compilação binária, recompilada quando o CSV muda.
+    try:
+        destino = compilar_log(CAMINHO_LOG)
+    except OSError as erro:
+        # Sem permissão de escrita em data/: o CSV é lido diretamente
+        logger.warning("Não foi possível compilar %s (%s); lendo o CSV", CAMINHO_LOG, erro)
+        return VersaoLog(*ler_csv_com_impressao(CAMINHO_LOG))
+
+    # O diretório da compilação tem o nome do hash dos bytes compilados (ver compilar_log), então
+    # a versão e os dados correspondem mesmo que o CSV seja trocado durante a carga
+    return VersaoLog(os.path.basename(destino), carregar_log(destino))
+
+
+def _versao_atual():
+    global _versao_log
+
+    if _versao_log is None:
+        with _lock_recarga:
+            if _versao_log is None:
+                _versao_log = _ler_log()
+
+    return _versao_log
+
+
+def obter_versao_log():
+    """
+    Versão do log de eventos usada pelo chamador.
+
+    Dentro de uma requisição (ver fixar_versao), todas as chamadas retornam a versão vigente no
+    primeiro acesso, mesmo que uma recarga a substitua no meio da requisição.
+    """
+    fixada = _versao_da_requisicao.get()
+    if fixada is None:
+        return _versao_atual()
+
+    if 'versao' not in fixada:
+        fixada['versao'] = _versao_atual()
+
+    return fixada['versao']
+
+
+def fixar_versao(versao=None):
+    """
+    Fixa a versão do log para o contexto atual (requisição ou tarefa em segundo plano).
+
+    :param versao: Versão a usar; se omitida, a versão vigente no primeiro acesso.
+    :return: Token para liberar_versao.
+    """
+    return _versao_da_requisicao.set({} if versao is None else {'versao': versao})
+
+
+def liberar_versao(token):
+    """Desfaz fixar_versao ao fim da requisição."""
+    _versao_da_requisicao.reset(token)
+
+
+def executar_na_versao(versao, executar):
+    """Executa `executar()` com a versão informada fixada (ex.: em uma thread de tarefas)."""
+    token = fixar_versao(versao)
+    try:
+        return executar()
+    finally:
+        liberar_versao(token)
+
+
+def obter_df_final():
+    """Log de eventos (id_discente, codigo, timestamp) da versão em uso."""
+    return obter_versao_log().df_final
+
+
+def obter_indice():
+    """Índice colunar do log de eventos da versão em uso."""
+    return obter_versao_log().indice
+
+
+def obter_matriz():
+    """Matriz aluno × disciplina (ver MatrizAlunoDisciplina) da versão em uso."""
+    return obter_versao_log().matriz
+
+
+def obter_rede():
+    """Rede de Petri do curso: (netCC, initial_marking, final_marking)."""
+    return _carregar_uma_vez('rede', lambda: pnml_importer.apply(CAMINHO_REDE))
+
+
+def obter_rede_compilada():
+    """Rede de Petri em matrizes de incidência (ver RedeCompilada), ou None se a rede não é suportada."""
+    def compilar():
+        try:
+            return RedeCompilada(*obter_rede())
+        except ValueError as erro:
+            logger.warning("Replay vetorizado indisponível para %s (%s); usando o pm4py", CAMINHO_REDE, erro)
+            return None
+
+    return _carregar_uma_vez('rede_compilada', compilar)
+
+
+def obter_impressao_log():
+    """Impressão digital da versão do log em uso, usada nas chaves de cache."""
+    return obter_versao_log().impressao
+
+
+def obter_impressao_arquivo_log():
+    """Impressão digital do CSV do log em disco, que pode estar à frente da versão em uso."""
+    return impressao_digital_arquivo(CAMINHO_LOG)
+
+
+def obter_impressao_rede():
+    """Impressão digital do PNML da rede, usada nas chaves de cache."""
+    return impressao_digital_arquivo(CAMINHO_REDE)
+
+
+def recarregar_log():
+    """
+    Carrega o CSV atual, se ele mudou, e troca a versão em uso.
+
+    A nova versão (compilação, DataFrame e índice) é montada por inteiro antes da troca, que é
+    apenas a atribuição de uma referência: requisições em andamento continuam com a versão
+    anterior, e as seguintes usam a nova. Como as chaves de cache incluem a impressão digital
+    da versão, apenas os resultados que dependem do log deixam de ser encontrados.
+
+    :return: Versão em uso após a recarga.
+    """
+    global _versao_log
+
+    with _lock_recarga:
+        if _versao_log is not None and _versao_log.impressao == obter_impressao_arquivo_log():
+            return _versao_log
+
+        inicio = time.perf_counter()
+        nova = _ler_log()
+        _versao_log = nova
+
+    logger.info("Log de eventos recarregado: versão %s em %.2f s", nova.impressao[:12], time.perf_counter() - inicio)
+
+    for funcao in _ao_recarregar:
+        try:
+            executar_na_versao(nova, funcao)
+        except Exception:
+            logger.exception("Falha ao executar %s após a recarga", funcao.__name__)
+
+    return nova
+
+
+def registrar_ao_recarregar(funcao):
+    """Registra `funcao()` para ser chamada após cada recarga do log, com a nova versão fixada."""
+    _ao_recarregar.append(funcao)
+
+
+def recarregar_em_segundo_plano():
+    """Inicia recarregar_log em uma thread; recargas simultâneas aguardam a mesma trava."""
+    def recarregar():
+        try:
+            recarregar_log()
+        except Exception:
+            # A versão anterior continua em uso
+            logger.exception("Falha ao recarregar %s", CAMINHO_LOG)
+
+    thread = threading.Thread(target=recarregar, name='recarga-log', daemon=True)
+    thread.start()
+    return thread
+
+
+def _observar(intervalo):
+    estado_anterior = None
+    while True:
+        try:
+            estado = os.stat(CAMINHO_LOG)
+            estado = (estado.st_mtime_ns, estado.st_size)
+        except OSError:
+            # CSV sendo substituído; tentar no próximo intervalo
+            estado = estado_anterior
+
+        # Só recarrega um log já carregado; recarregar_log ignora mudanças apenas de mtime
+        if estado != estado_anterior and _versao_log is not None:
+            try:
+                recarregar_log()
+            except Exception:
+                logger.exception("Falha ao recarregar %s", CAMINHO_LOG)
+        estado_anterior = estado
+
+        time.sleep(intervalo)
+
+
+def iniciar_observador(intervalo):
+    """
+    Observa o CSV do log e o recarrega quando ele muda (mtime ou tamanho).
+
+    Threads não sobrevivem ao fork, então o observador é reiniciado em cada processo filho
+    (ex.: workers do gunicorn com preload), e cada processo recarrega a sua versão.
+
+    :param intervalo: Segundos entre verificações.
+    """
+    global _observador, _intervalo_observador
+
+    if _observador is not None and _observador.is_alive():
+        return
+
+    if _intervalo_observador is None:
+        os.register_at_fork(after_in_child=_reiniciar_observador)
+
+    _intervalo_observador = intervalo
+    _observador = threading.Thread(target=_observar, args=(intervalo,), name='observador-log', daemon=True)
+    _observador.start()
+
+
+def _reiniciar_observador():
+    global _lock_recarga, _observador
+
+    # A trava pode ter sido copiada ocupada por uma recarga em andamento no processo pai
+    _lock_recarga = threading.Lock()
+    _observador = None
+    iniciar_observador(_intervalo_observador)
+
+
+def carregar_tudo():
+    """Carrega antecipadamente o log, o índice e a rede, também compilada (ex.: no master do gunicorn, antes do fork)."""
+    obter_versao_log()
+    obter_rede()
+    obter_rede_compilada()
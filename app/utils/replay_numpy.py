@@ -0,0 +1,180 @@
+import numpy as np
+from pm4py.objects.petri_net.obj import Marking
+
+
+class RedeCompilada:
+    """
+    Rede de Petri compilada em matrizes de incidência para o token replay vetorizado.
+
+    - lugares / transicoes: objetos da rede, na ordem das colunas / linhas das matrizes.
+    - pre / pos: tokens consumidos / produzidos por cada transição em cada lugar (transições × lugares).
+    - consumo / producao: total de tokens consumidos / produzidos por transição.
+    - transicao_do_rotulo: rótulo -> posição da transição.
+    - marcacao_inicial / marcacao_final: tokens por lugar.
+
+    Sem transições silenciosas e com rótulos distintos, o token replay do pm4py (com os
+    parâmetros padrão) apenas dispara a transição de cada evento, adicionando antes os tokens
+    que faltam; não há busca por caminhos de transições silenciosas. Redes fora desse caso
+    não são compiladas (ValueError) e continuam no replay do pm4py.
+    """
+
+    def __init__(self, net, initial_marking, final_marking):
+        silenciosas = [transicao.name for transicao in net.transitions if transicao.label is None]
+        if silenciosas:
+            raise ValueError(f"a rede possui transições silenciosas: {', '.join(sorted(silenciosas))}")
+
+        self.lugares = sorted(net.places, key=lambda lugar: lugar.name)
+        self.transicoes = sorted(net.transitions, key=lambda transicao: transicao.name)
+
+        self.transicao_do_rotulo = {}
+        for posicao, transicao in enumerate(self.transicoes):
+            if transicao.label in self.transicao_do_rotulo:
+                raise ValueError(f"a rede possui mais de uma transição com o rótulo {transicao.label}")
+            self.transicao_do_rotulo[transicao.label] = posicao
+
+        posicao_lugar = {lugar: posicao for posicao, lugar in enumerate(self.lugares)}
+        posicao_transicao = {transicao: posicao for posicao, transicao in enumerate(self.transicoes)}
+
+        self.pre = np.zeros((len(self.transicoes), len(self.lugares)), dtype=np.int32)
+        self.pos = np.zeros((len(self.transicoes), len(self.lugares)), dtype=np.int32)
+        for arco in net.arcs:
+            if arco.source in posicao_transicao:
+                self.pos[posicao_transicao[arco.source], posicao_lugar[arco.target]] += arco.weight
+            else:
+                self.pre[posicao_transicao[arco.target], posicao_lugar[arco.source]] += arco.weight
+
+        self.consumo = self.pre.sum(axis=1)
+        self.producao = self.pos.sum(axis=1)
+
+        self.marcacao_inicial = self._vetor(initial_marking, posicao_lugar)
+        self.marcacao_final = self._vetor(final_marking, posicao_lugar)
+
+    def _vetor(self, marcacao, posicao_lugar):
+        vetor = np.zeros(len(self.lugares), dtype=np.int32)
+        for lugar, tokens in marcacao.items():
+            vetor[posicao_lugar[lugar]] = tokens
+        return vetor
+
+    def codificar(self, variantes):
+        """
+        Converte as variantes em uma matriz de posições de transição.
+
+        :param variantes: Lista de variantes (tuplas de atividades).
+        :return: Matriz (variantes × maior variante) com a transição de cada evento; -1 para
+                 atividades fora do modelo (ignoradas pelo replay) e posições após o fim da variante.
+        """
+        comprimento = max((len(variante) for variante in variantes), default=0)
+        eventos = np.full((len(variantes), comprimento), -1, dtype=np.int32)
+        for i, variante in enumerate(variantes):
+            eventos[i, :len(variante)] = [self.transicao_do_rotulo.get(atividade, -1) for atividade in variante]
+
+        return eventos
+
+
+def reproduzir_variantes_numpy(variantes, rede):
+    """
+    Executa o token replay de todas as variantes ao mesmo tempo, um evento por vez.
+
+    A marcação de cada variante é uma linha de uma matriz (variantes × lugares); disparar a
+    transição do k-ésimo evento de todas as variantes é uma operação sobre as linhas de `pre`
+    e `pos`. O resultado é igual ao de token_replay.apply com os parâmetros padrão.
+
+    :param variantes: Lista de variantes (tuplas de atividades).
+    :param rede: RedeCompilada.
+    :return: Lista de resultados do replay, na ordem das variantes, com os mesmos campos do pm4py.
+    """
+    eventos = rede.codificar(variantes)
+    num_variantes, comprimento = eventos.shape
+
+    marcacao = np.tile(rede.marcacao_inicial, (num_variantes, 1))
+    faltantes = np.zeros(num_variantes, dtype=np.int64)
+    consumidos = np.zeros(num_variantes, dtype=np.int64)
+    produzidos = np.full(num_variantes, rede.marcacao_inicial.sum(), dtype=np.int64)
+    com_problema = np.zeros(eventos.shape, dtype=bool)
+
+    for k in range(comprimento):
+        linhas = np.flatnonzero(eventos[:, k] >= 0)
+        transicoes = eventos[linhas, k]
+        pre = rede.pre[transicoes]
+
+        # Transição não habilitada: como no pm4py, os lugares sem tokens suficientes recebem
+        # o peso do arco e a diferença conta como tokens faltantes
+        atual = marcacao[linhas]
+        falta = atual < pre
+        faltantes[linhas] += np.where(falta, pre - atual, 0).sum(axis=1)
+        com_problema[linhas, k] = falta.any(axis=1)
+
+        marcacao[linhas] = atual + np.where(falta, pre, 0) - pre + rede.pos[transicoes]
+        consumidos[linhas] += rede.consumo[transicoes]
+        produzidos[linhas] += rede.producao[transicoes]
+
+    # Comparação com a marcação final
+    faltantes += np.maximum(rede.marcacao_final - marcacao, 0).sum(axis=1)
+    restantes = np.maximum(marcacao - rede.marcacao_final, 0).sum(axis=1)
+    consumidos += rede.marcacao_final.sum()
+
+    habilitadas = (marcacao[:, None, :] >= rede.pre[None, :, :]).all(axis=2)
+
+    resultados = []
+    for i in range(num_variantes):
+        transicoes = eventos[i][eventos[i] >= 0]
+        problemas = eventos[i][com_problema[i]]
+        faltou, consumiu, restou, produziu = int(faltantes[i]), int(consumidos[i]), int(restantes[i]), int(produzidos[i])
+
+        if consumiu > 0 and produziu > 0:
+            fitness = 0.5 * (1.0 - float(faltou) / float(consumiu)) + 0.5 * (1.0 - float(restou) / float(produziu))
+        else:
+            fitness = 1.0
+
+        resultados.append({
+            "trace_is_fit": faltou == 0 and restou == 0,
+            "trace_fitness": fitness,
+            "activated_transitions": [rede.transicoes[t] for t in transicoes],
+            "reached_marking": Marking({rede.lugares[j]: int(marcacao[i, j]) for j in np.flatnonzero(marcacao[i])}),
+            "enabled_transitions_in_marking": {rede.transicoes[t] for t in np.flatnonzero(habilitadas[i])},
+            "transitions_with_problems": [rede.transicoes[t] for t in problemas],
+            "missing_tokens": faltou,
+            "consumed_tokens": consumiu,
+            "remaining_tokens": restou,
+            "produced_tokens": produziu,
+        })
+
+    return resultados
+
+
+def listar_variantes(df_final):
+    """
+    Variantes reproduzidas pelas visualizações: trajetórias completas de cada aluno e
+    trajetórias cortadas por cada faixa de anos do log.
+
+    :param df_final: Log de eventos (id_discente, codigo, timestamp).
+    :return: Lista ordenada de variantes (tuplas de atividades).
+    """
+    df_final = df_final.sort_values(['id_discente', 'timestamp'], kind='stable')
+    anos = df_final['timestamp'].dt.year
+
+    variantes = set(df_final.groupby('id_discente')['codigo'].agg(tuple))
+    for ano_inicio in range(anos.min(), anos.max() + 1):
+        for ano_fim in range(ano_inicio, anos.max() + 1):
+            faixa = df_final[(anos >= ano_inicio) & (anos <= ano_fim)]
+            variantes.update(faixa.groupby('id_discente')['codigo'].agg(tuple))
+
+    return sorted(variantes)
+
+
+def comparar_resultados(esperados, obtidos):
+    """
+    Compara resultados de replay campo a campo.
+
+    :return: Lista de (posição da variante, campo) que diferem.
+    """
+    diferencas = []
+    for i, (esperado, obtido) in enumerate(zip(esperados, obtidos)):
+        for campo, valor in esperado.items():
+            if obtido.get(campo) != valor:
+                diferencas.append((i, campo))
+
+    if len(esperados) != len(obtidos):
+        diferencas.append((min(len(esperados), len(obtidos)), 'quantidade de resultados'))
+
+    return diferencas
@@ -0,0 +1,124 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from pm4py.objects.petri_net.importer import importer as pnml_importer
+from pm4py.algo.conformance.tokenreplay import algorithm as token_replay
+from pm4py.objects.log.obj import EventLog
+from pm4py.objects.petri_net.obj import Marking
+from pm4py.util import variants_util
+
+from app.utils.replay_numpy import reproduzir_variantes_numpy
+
+# Motor do replay: 'numpy' (matrizes de incidência, quando a rede é suportada) ou 'pm4py'
+MOTOR = os.environ.get('REPLAY_MOTOR', 'numpy')
+
+# Número de partições (processos) do replay do pm4py; 1 executa no próprio processo
+PARTICOES = int(os.environ.get('REPLAY_PARTICOES', '1'))
+
+# Abaixo deste número de variantes o custo de enviar o trabalho supera o ganho
+MIN_VARIANTES_POR_PARTICAO = 16
+
+# Processos do pool: 'forkserver' (ou 'spawn'), nunca fork direto do servidor, que tem
+# threads (requisições, tarefas em segundo plano) que podem estar segurando travas no fork
+METODO_INICIO = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+# Sem barra de progresso: cada partição (e cada requisição) imprimiria a sua no stderr
+PARAMETROS_REPLAY = {token_replay.Variants.TOKEN_REPLAY.value.Parameters.SHOW_PROGRESS_BAR: False}
+
+_executor = None
+_pid_executor = None
+_processos_executor = None
+
+# Rede carregada uma vez em cada processo do pool
+_rede = None
+
+
+def _iniciar_processo(caminho_rede):
+    global _rede
+    _rede = pnml_importer.apply(caminho_rede)
+
+
+def _replay_particao(variantes):
+    """Executa o replay de uma partição de variantes no processo do pool e devolve nomes em vez de objetos."""
+    net, initial_marking, final_marking = _rede
+    log = EventLog([variants_util.variant_to_trace(variante) for variante in variantes])
+    parametros = {**PARAMETROS_REPLAY, token_replay.Variants.TOKEN_REPLAY.value.Parameters.RETURN_NAMES: True}
+
+    return token_replay.apply(log, net, initial_marking, final_marking, parameters=parametros)
+
+
+def _obter_executor(caminho_rede, processos):
+    global _executor, _pid_executor, _processos_executor
+
+    # Um pool por processo (ex.: cada worker do gunicorn cria o seu após o fork)
+    if _executor is None or _pid_executor != os.getpid() or _processos_executor != processos:
+        if _executor is not None and _pid_executor == os.getpid():
+            _executor.shutdown(wait=False)
+        # Os processos começam sem estado herdado: a rede é carregada pelo inicializador
+        _executor = ProcessPoolExecutor(
+            max_workers=processos,
+            mp_context=multiprocessing.get_context(METODO_INICIO),
+            initializer=_iniciar_processo,
+            initargs=(caminho_rede,),
+        )
+        _pid_executor = os.getpid()
+        _processos_executor = processos
+
+    return _executor
+
+
+def _restaurar_objetos(trace_result, lugares, transicoes):
+    """Converte os nomes devolvidos pelo pool nos objetos Place/Transition da rede do processo principal."""
+    return {
+        "trace_is_fit": trace_result["trace_is_fit"],
+        "trace_fitness": trace_result["trace_fitness"],
+        "activated_transitions": [transicoes[nome] for nome in trace_result["activated_transitions"]],
+        "reached_marking": Marking({lugares[nome]: tokens for nome, tokens in trace_result["reached_marking"].items()}),
+        "enabled_transitions_in_marking": {transicoes[nome] for nome in trace_result["enabled_transitions_in_marking"]},
+        "transitions_with_problems": [transicoes[nome] for nome in trace_result["transitions_with_problems"]],
+        "missing_tokens": trace_result["missing_tokens"],
+        "consumed_tokens": trace_result["consumed_tokens"],
+        "remaining_tokens": trace_result["remaining_tokens"],
+        "produced_tokens": trace_result["produced_tokens"],
+    }
+
+
+def reproduzir_variantes(variantes, net, initial_marking, final_marking, caminho_rede, particoes=None, rede_compilada=None):
+    """
+    Executa o token replay de uma lista de variantes.
+
+    Com a rede compilada e REPLAY_MOTOR=numpy, o replay é vetorizado no próprio processo; caso
+    contrário, usa o pm4py, dividindo as variantes em partições processadas em paralelo.
+
+    :param variantes: Lista de variantes (tuplas de atividades).
+    :param net: Rede de Petri do processo principal (os resultados referenciam seus objetos).
+    :param initial_marking: Marcação inicial.
+    :param final_marking: Marcação final.
+    :param caminho_rede: Caminho do PNML, carregado uma vez por processo do pool.
+    :param particoes: Número de partições; padrão REPLAY_PARTICOES.
+    :param rede_compilada: RedeCompilada de `net`, ou None para usar o pm4py.
+    :return: Lista de resultados do replay, na ordem das variantes.
+    """
+    if MOTOR == 'numpy' and rede_compilada is not None:
+        return reproduzir_variantes_numpy(variantes, rede_compilada)
+
+    processos = PARTICOES if particoes is None else particoes
+    particoes = min(processos, len(variantes) // MIN_VARIANTES_POR_PARTICAO)
+
+    if particoes <= 1:
+        log = EventLog([variants_util.variant_to_trace(variante) for variante in variantes])
+        return token_replay.apply(log, net, initial_marking, final_marking, parameters=PARAMETROS_REPLAY)
+
+    # Partições intercaladas equilibram variantes longas e curtas
+    blocos = [variantes[i::particoes] for i in range(particoes)]
+    resultados_blocos = list(_obter_executor(caminho_rede, processos).map(_replay_particao, blocos))
+
+    lugares = {place.name: place for place in net.places}
+    transicoes = {transition.name: transition for transition in net.transitions}
+
+    resultados = [None] * len(variantes)
+    for i, resultados_bloco in enumerate(resultados_blocos):
+        resultados[i::particoes] = [_restaurar_objetos(r, lugares, transicoes) for r in resultados_bloco]
+
+    return resultados
@@ -0,0 +1,78 @@
+import numpy as np
+
+from app.utils.indice import semestre
+from app.utils.registro import obter_indice
+
+
+def rotulo_semestre(indice_semestre):
+    """Rótulo 'AAAA.S' de um índice de semestre (ex.: '2023.2')."""
+    return f"{1970 + indice_semestre // 2}.{indice_semestre % 2 + 1}"
+
+
+def curvas_sobrevivencia(selecao=None):
+    """
+    Curvas de permanência das turmas: a fração dos alunos ainda matriculados, formados e
+    evadidos k semestres após o ingresso, para todas as turmas de uma vez.
+
+    Cada aluno com evento 'Iniciou' sai da curva de matriculados no semestre do 'verificador'
+    (formado) ou no primeiro semestre sem nenhum evento (evadido); alunos ativos no último ano
+    do log continuam matriculados. As curvas vão até o último semestre do log, então turmas mais
+    recentes têm curvas mais curtas. No último ponto, a divisão é a mesma de analisar_turma.
+
+    :param selecao: Ano de ingresso (int) para uma única turma, faixa de anos de ingresso
+                    [ano_inicio, ano_fim] (list, inclusiva) ou None para todas as turmas.
+    :return: Dicionário com 'ano_ativo', 'ultimo_semestre' e 'turmas': uma entrada por turma
+             da seleção com o ano, o número de alunos e as frações por semestre desde o ingresso.
+    """
+    indice = obter_indice()
+
+    alunos = indice.alunos_da_selecao(selecao)
+    turma = indice.ano_ingresso[alunos]
+    if len(turma) == 0:
+        return {'ano_ativo': indice.ano_ativo, 'ultimo_semestre': None, 'turmas': []}
+
+    formado = indice.formado[alunos]
+    evadido = ~formado & ~indice.ativo[alunos]
+
+    # Semestres desde o ingresso
+    ingresso = semestre(indice.dia_ingresso[alunos])
+    ultimo_semestre = int(semestre(indice.dia.max()))
+    saida_formado = semestre(indice.dia_formatura[alunos][formado]) - ingresso[formado]
+    saida_evadido = semestre(indice.ultimo_dia[alunos][evadido]) - ingresso[evadido] + 1
+
+    turmas, posicao = np.unique(turma, return_inverse=True)
+    num_semestres = ultimo_semestre - int(ingresso.min()) + 1
+
+    # Saídas por (turma, semestre) e acumuladas ao longo dos semestres
+    formados = np.zeros((len(turmas), num_semestres), dtype=np.int64)
+    np.add.at(formados, (posicao[formado], np.clip(saida_formado, 0, num_semestres - 1)), 1)
+    evadidos = np.zeros((len(turmas), num_semestres), dtype=np.int64)
+    np.add.at(evadidos, (posicao[evadido], np.clip(saida_evadido, 0, num_semestres - 1)), 1)
+
+    formados = np.cumsum(formados, axis=1)
+    evadidos = np.cumsum(evadidos, axis=1)
+    tamanho = np.bincount(posicao)
+    matriculados = tamanho[:, None] - formados - evadidos
+
+    # Cada turma é observada do semestre de ingresso mais antigo até o último semestre do log
+    primeiro_ingresso = np.full(len(turmas), ultimo_semestre, dtype=np.int64)
+    np.minimum.at(primeiro_ingresso, posicao, ingresso)
+    observados = ultimo_semestre - primeiro_ingresso + 1
+
+    resultado = []
+    for i, ano in enumerate(turmas):
+        n = observados[i]
+        resultado.append({
+            'turma': int(ano),
+            'alunos': int(tamanho[i]),
+            'semestres': list(range(n)),
+            'matriculados': np.round(matriculados[i, :n] / tamanho[i], 4).tolist(),
+            'formados': np.round(formados[i, :n] / tamanho[i], 4).tolist(),
+            'evadidos': np.round(evadidos[i, :n] / tamanho[i], 4).tolist(),
+        })
+
+    return {
+        'ano_ativo': indice.ano_ativo,
+        'ultimo_semestre': rotulo_semestre(ultimo_semestre),
+        'turmas': resultado,
+    }
@@ -0,0 +1,172 @@
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.utils.cache import CacheDisco
+
+# Número de threads que executam as tarefas em segundo plano (por processo)
+THREADS = int(os.environ.get('TAREFAS_THREADS', '2'))
+
+# Estado e resultados das tarefas em disco, compartilhados por todos os workers do servidor:
+# a consulta pode chegar a um worker diferente do que recebeu a submissão
+DIRETORIO = os.environ.get('TAREFAS_DIRETORIO', 'app/images/tarefas')
+
+# Tarefa em andamento há mais tempo que isso (ex.: o worker que a executava foi encerrado) é
+# informada como interrompida e executada de novo na próxima submissão
+TEMPO_MAXIMO = int(os.environ.get('TAREFAS_TEMPO_MAXIMO', '600'))
+
+# Erros e tarefas interrompidas são informados por este tempo (s) e depois descartados
+TEMPO_RETENCAO = int(os.environ.get('TAREFAS_TEMPO_RETENCAO', '86400'))
+
+# Tamanho máximo dos resultados guardados; os consultados há mais tempo são descartados
+MAX_BYTES_RESULTADOS = 200 * 1024 * 1024
+
+EM_ANDAMENTO = 'em_andamento'
+CONCLUIDA = 'concluida'
+ERRO = 'erro'
+
+_executor = None
+_resultados = None
+_pid = None
+_lock = threading.Lock()
+
+
+def _inicializar():
+    global _executor, _resultados, _pid
+
+    # Um executor por processo (ex.: cada worker do gunicorn cria o seu após o fork)
+    with _lock:
+        if _executor is None or _pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=THREADS, thread_name_prefix='tarefa')
+            _resultados = CacheDisco(os.path.join(DIRETORIO, 'resultados'), MAX_BYTES_RESULTADOS)
+            os.makedirs(os.path.join(DIRETORIO, 'estado'), exist_ok=True)
+            _pid = os.getpid()
+
+    return _executor, _resultados
+
+
+def _caminho_estado(id_tarefa, estado):
+    return os.path.join(DIRETORIO, 'estado', f'{id_tarefa}.{estado}')
+
+
+def _idade(caminho):
+    """Segundos desde a última modificação do arquivo, ou None se ele não existe."""
+    try:
+        return time.time() - os.stat(caminho).st_mtime
+    except FileNotFoundError:
+        return None
+
+
+def _em_andamento(id_tarefa):
+    idade = _idade(_caminho_estado(id_tarefa, EM_ANDAMENTO))
+    return idade is not None and idade < TEMPO_MAXIMO
+
+
+def _reservar(id_tarefa):
+    """Marca a tarefa como em andamento; False se outro processo ou thread já a reservou."""
+    caminho = _caminho_estado(id_tarefa, EM_ANDAMENTO)
+
+    # Reserva abandonada por um worker encerrado no meio da tarefa
+    if os.path.exists(caminho) and not _em_andamento(id_tarefa):
+        _remover(caminho)
+
+    try:
+        descritor = os.open(caminho, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return False
+
+    os.write(descritor, str(os.getpid()).encode())
+    os.close(descritor)
+    return True
+
+
+def _remover(caminho):
+    try:
+        os.remove(caminho)
+    except FileNotFoundError:
+        pass
+
+
+def _descartar_estados():
+    """Remove erros e reservas abandonadas mais antigos que TEMPO_RETENCAO."""
+    diretorio = os.path.join(DIRETORIO, 'estado')
+    for nome in os.listdir(diretorio):
+        idade = _idade(os.path.join(diretorio, nome))
+        if idade is not None and idade > max(TEMPO_RETENCAO, TEMPO_MAXIMO):
+            _remover(os.path.join(diretorio, nome))
+
+
+def _executar(id_tarefa, executar):
+    _, resultados = _inicializar()
+    try:
+        # guardar também descarta os resultados excedentes; os estados antigos saem junto
+        resultados.guardar(id_tarefa, executar())
+    except Exception as erro:
+        with open(_caminho_estado(id_tarefa, ERRO), 'w', encoding='utf-8') as arquivo:
+            arquivo.write(str(erro))
+    finally:
+        _remover(_caminho_estado(id_tarefa, EM_ANDAMENTO))
+        _descartar_estados()
+
+
+def submeter(id_tarefa, executar):
+    """
+    Enfileira `executar()` no executor em segundo plano sob o id informado.
+
+    Submissões com o mesmo id, em qualquer worker, reaproveitam a tarefa existente, em
+    andamento ou concluída; apenas uma tarefa que falhou ou foi interrompida é executada novamente.
+
+    :param id_tarefa: Identificador determinístico do trabalho (ex.: chave de cache).
+    :param executar: Função sem argumentos que produz o resultado (bytes).
+    :return: Estado da tarefa: EM_ANDAMENTO ou CONCLUIDA.
+    """
+    executor, resultados = _inicializar()
+
+    # Apenas a existência do resultado: sem ler a imagem nem marcar o uso
+    if resultados.contem(id_tarefa):
+        return CONCLUIDA
+    if _em_andamento(id_tarefa):
+        return EM_ANDAMENTO
+
+    if _reservar(id_tarefa):
+        _remover(_caminho_estado(id_tarefa, ERRO))
+        executor.submit(_executar, id_tarefa, executar)
+
+    return EM_ANDAMENTO
+
+
+def consultar(id_tarefa):
+    """
+    Consulta uma tarefa submetida em qualquer worker.
+
+    :param id_tarefa: Identificador retornado na submissão.
+    :return: (estado, valor): (CONCLUIDA, bytes do resultado), (ERRO, mensagem) se a tarefa
+             falhou ou foi interrompida (reserva expirada sem resultado), (EM_ANDAMENTO, None)
+             ou (None, None) se a tarefa não existe (ou já foi descartada).
+    """
+    # O id compõe nomes de arquivo: apenas chaves de gerar_chave são aceitas
+    if not re.fullmatch(r'[0-9a-f]{64}', id_tarefa):
+        return None, None
+
+    _, resultados = _inicializar()
+
+    dados = resultados.obter(id_tarefa)
+    if dados is not None:
+        return CONCLUIDA, dados
+
+    if _em_andamento(id_tarefa):
+        return EM_ANDAMENTO, None
+
+    try:
+        with open(_caminho_estado(id_tarefa, ERRO), encoding='utf-8') as arquivo:
+            return ERRO, arquivo.read()
+    except FileNotFoundError:
+        pass
+
+    # Reserva expirada sem resultado nem erro: o worker que executava a tarefa foi encerrado
+    if os.path.exists(_caminho_estado(id_tarefa, EM_ANDAMENTO)):
+        return ERRO, f"Tarefa interrompida sem resultado após {TEMPO_MAXIMO} s. Submeta novamente."
+
+    return None, None
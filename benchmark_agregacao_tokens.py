@@ -0,0 +1,117 @@
+"""
+Benchmark da agregação de tokens das visualizações de mineração de processos:
+consolidar_tokens_por_disciplina e calcular_media_tokens_por_area (percorrem os arcos da rede
+a cada marcação) contra AgregacaoTokens (matrizes compiladas uma vez por rede).
+
+A marcação agregada de cada faixa de anos do log é comparada entre as duas implementações
+e os tempos são somados sobre todas as faixas.
+
+Uso:
+> python benchmark_agregacao_tokens.py --repeticoes 5
+"""
+import argparse
+import warnings
+from collections import defaultdict
+
+from app.utils.process_mining import consolidate_reached_markings, dados, obter_agregacao_tokens, obter_replay
+from app.utils.registro import obter_df_final, obter_rede
+from benchmark_comum import medir
+
+
+def consolidar_tokens_por_disciplina(petri_net, reached_marking_result):
+    """
+    Consolida os tokens em lugares intermediários entre as transições QXD001 -> QXD001_APROVADO.
+
+    Implementação anterior de AgregacaoTokens.tokens_por_disciplina, mantida como referência
+    de resultados e de tempo.
+
+    :param petri_net: Rede de Petri.
+    :param reached_marking_result: Dicionário com os tokens em cada lugar.
+    :return: Dicionário consolidado com os tokens por disciplina.
+    """
+    tokens_por_disciplina = defaultdict(int)
+
+    for place in petri_net.places:
+        # Verificar se o lugar está conectado entre "QXD001" e "QXD001_APROVADO"
+        entrada_disciplinas = [
+            arc.source.label for arc in place.in_arcs if arc.source.label and arc.source.label.startswith("QXD")
+        ]
+        saida_disciplinas = [
+            arc.target.label for arc in place.out_arcs if arc.target.label and arc.target.label.endswith("_APROVADO")
+        ]
+
+        # Consolidar tokens se as condições forem atendidas
+        if entrada_disciplinas and saida_disciplinas:
+            for entrada in entrada_disciplinas:
+                disciplina = entrada
+                tokens_por_disciplina[disciplina] += reached_marking_result.get(
+                    place, 0)
+
+    return dict(tokens_por_disciplina)
+
+
+def calcular_media_tokens_por_area(dados, tokens_por_disciplina):
+    """
+    Calcula a média de tokens por disciplina para cada área de conhecimento.
+
+    Implementação anterior de AgregacaoTokens.media_tokens_por_area, mantida como referência
+    de resultados e de tempo.
+
+    :param dados: Dicionário com as áreas de conhecimento e suas disciplinas.
+    :param tokens_por_disciplina: Dicionário com os tokens por disciplina.
+    :return: Dicionário com a média de tokens por área de conhecimento.
+    """
+    tokens_por_area = defaultdict(int)
+    num_disciplinas_por_area = defaultdict(int)
+
+    # Mapear cada disciplina para sua área de conhecimento e contar o número de disciplinas por área
+    for area, disciplinas in zip(dados["Área de Conhecimento"], dados["Disciplina"]):
+        num_disciplinas_por_area[area] = len(disciplinas)
+        for disciplina in disciplinas:
+            if disciplina in tokens_por_disciplina:
+                tokens_por_area[area] += tokens_por_disciplina[disciplina]
+
+    # Calcular a média de tokens por disciplina para cada área
+    media_tokens_por_area = {}
+    for area in tokens_por_area:
+        media_tokens_por_area[area] = tokens_por_area[area] / num_disciplinas_por_area[area]
+
+    return media_tokens_por_area
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compara a agregação de tokens pelos arcos e por matrizes.')
+    parser.add_argument('--repeticoes', type=int, default=5)
+    args = parser.parse_args()
+
+    warnings.simplefilter('ignore', FutureWarning)
+
+    net = obter_rede()[0]
+    agregacao = obter_agregacao_tokens()
+
+    anos = obter_df_final()['timestamp'].dt.year
+    faixas = [[ano_inicio, ano_fim] for ano_inicio in range(anos.min(), anos.max() + 1)
+              for ano_fim in range(ano_inicio, anos.max() + 1)]
+    marcacoes = [consolidate_reached_markings(obter_replay(faixa)) for faixa in faixas]
+
+    def pelos_arcos():
+        return [calcular_media_tokens_por_area(dados, consolidar_tokens_por_disciplina(net, marcacao))
+                for marcacao in marcacoes]
+
+    def por_matrizes():
+        return [agregacao.media_tokens_por_area(agregacao.tokens_por_disciplina(marcacao))
+                for marcacao in marcacoes]
+
+    for faixa, marcacao in zip(faixas, marcacoes):
+        tokens = consolidar_tokens_por_disciplina(net, marcacao)
+        if (tokens != agregacao.tokens_por_disciplina(marcacao)
+                or calcular_media_tokens_por_area(dados, tokens) != agregacao.media_tokens_por_area(tokens)):
+            raise AssertionError(f"Resultados diferentes para a faixa {faixa}")
+
+    atual, _ = medir(pelos_arcos, args.repeticoes)
+    novo, _ = medir(por_matrizes, args.repeticoes)
+    print(f"{len(faixas)} faixas de anos: arcos {atual * 1000:.1f} ms, matrizes {novo * 1000:.1f} ms ({atual / novo:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
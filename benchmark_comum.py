@@ -0,0 +1,21 @@
+"""
+Funções comuns aos scripts benchmark_*.py.
+"""
+import time
+
+
+def medir(funcao, repeticoes):
+    """
+    Executa `funcao()` `repeticoes` vezes.
+
+    :param funcao: Função sem argumentos a medir.
+    :param repeticoes: Número de execuções.
+    :return: (menor tempo em s entre as repetições, resultado da última execução).
+    """
+    tempos = []
+    resultado = None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos), resultado
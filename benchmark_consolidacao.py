@@ -0,0 +1,125 @@
+"""
+Benchmark da tabela consolidada: consolidar_metricas (quatro métricas + merges + JSON)
+contra consolidar_registros (passagem única sobre o índice), em um log sintético.
+
+O log sintético repete o logfinal.csv `--fator` vezes com ids de alunos deslocados, o que
+multiplica alunos e eventos mantendo a distribuição real de disciplinas e resultados.
+
+Uso:
+> python benchmark_consolidacao.py --fator 10 --repeticoes 5
+"""
+import argparse
+import json
+import os
+import tempfile
+import warnings
+
+import pandas as pd
+
+from app.utils import registro
+from app.utils.new_image_generate import calcular_metricas, codigo_para_nome, consolidar_registros
+from benchmark_comum import medir
+
+
+def consolidar_metricas(selecao=None, metricas=None):
+    """
+    Consolida as métricas de gargalo, taxa de aprovação, supressões e trancamentos em uma única tabela.
+
+    Implementação anterior de consolidar_registros (métricas em DataFrames + merges + JSON),
+    mantida como referência de resultados e de tempo.
+
+    Parâmetros:
+    - selecao: Ano específico (int), faixa de anos (list) ou None (todos os anos).
+    - metricas: Resultado de calcular_metricas(selecao) já calculado, se houver.
+
+    Retorno:
+    - JSON (orient='records') da tabela consolidada, com as colunas:
+        - Código: Código da disciplina.
+        - Nome: Nome da disciplina.
+        - Gargalo: Número de alunos que enfrentaram gargalos (inteiro).
+        - Taxa de Aprovação (%): Porcentagem de aprovação (2 casas decimais).
+        - Supressões: Número de supressões na disciplina (inteiro).
+        - Trancamentos: Número de trancamentos na disciplina (inteiro).
+    """
+    # Calcular métricas individuais
+    if metricas is None:
+        metricas = calcular_metricas(selecao, ["gargalo", "supressao", "trancamento", "aprovacao_primeira_vez"])
+
+    gargalos_por_disciplina = metricas["gargalo"]
+    supressoes_por_disciplina = metricas["supressao"]
+    trancamentos_por_disciplina = metricas["trancamento"]
+    total_aprovacoes, alunos_por_disciplina = metricas["aprovacao_primeira_vez"]
+
+    # Taxa de aprovação em porcentagem
+    taxa_aprovacao = ((total_aprovacoes / alunos_por_disciplina) * 100).fillna(0).reset_index()
+    taxa_aprovacao.columns = ['Código', 'Taxa de Aprovação (%)']
+
+    # Garantir que a coluna Nome esteja em todos os DataFrames
+    gargalos_por_disciplina = gargalos_por_disciplina.rename(columns={'Quantidade': 'Gargalo'})
+    supressoes_por_disciplina = supressoes_por_disciplina.rename(columns={'Quantidade': 'Supressões'})
+    trancamentos_por_disciplina = trancamentos_por_disciplina.rename(columns={'Quantidade': 'Trancamentos'})
+
+    # Criar a coluna Nome com base no mapeamento, se necessário
+    gargalos_por_disciplina['Nome'] = gargalos_por_disciplina['Código'].map(codigo_para_nome)
+    supressoes_por_disciplina['Nome'] = supressoes_por_disciplina['Código'].map(codigo_para_nome)
+    trancamentos_por_disciplina['Nome'] = trancamentos_por_disciplina['Código'].map(codigo_para_nome)
+    taxa_aprovacao['Nome'] = taxa_aprovacao['Código'].map(codigo_para_nome)
+
+    # Mesclar os resultados em uma única tabela
+    consolidado = pd.merge(gargalos_por_disciplina, taxa_aprovacao, on=['Código', 'Nome'], how='outer')
+    consolidado = pd.merge(consolidado, supressoes_por_disciplina, on=['Código', 'Nome'], how='outer')
+    consolidado = pd.merge(consolidado, trancamentos_por_disciplina, on=['Código', 'Nome'], how='outer')
+
+    # Preencher valores NaN com 0 (para disciplinas sem dados em alguma métrica)
+    consolidado = consolidado.fillna(0)
+
+    # Garantir tipos adequados para cada coluna
+    consolidado['Gargalo'] = consolidado['Gargalo'].astype(int)
+    consolidado['Supressões'] = consolidado['Supressões'].astype(int)
+    consolidado['Trancamentos'] = consolidado['Trancamentos'].astype(int)
+    consolidado['Taxa de Aprovação (%)'] = consolidado['Taxa de Aprovação (%)'].round(2)
+
+    # Reordenar as colunas
+    consolidado = consolidado[['Código', 'Nome', 'Gargalo', 'Taxa de Aprovação (%)', 'Supressões', 'Trancamentos']]
+
+    return consolidado.to_json(orient='records')
+
+
+def gerar_log_sintetico(fator, caminho):
+    df = pd.read_csv(registro.CAMINHO_LOG)
+    deslocamento = 10 ** len(str(df['id_discente'].max()))
+    copias = [df.assign(id_discente=df['id_discente'] + i * deslocamento) for i in range(fator)]
+    pd.concat(copias, ignore_index=True).to_csv(caminho, index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compara consolidar_metricas e consolidar_registros.')
+    parser.add_argument('--fator', type=int, default=10, help='Quantas vezes o log real é repetido.')
+    parser.add_argument('--repeticoes', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        caminho = os.path.join(diretorio, 'logfinal.csv')
+        gerar_log_sintetico(args.fator, caminho)
+
+        # O log sintético precisa ser apontado antes do primeiro carregamento
+        registro.CAMINHO_LOG = caminho
+
+        indice = registro.obter_indice()
+        print(f"Log sintético: {len(indice.aluno)} eventos, {len(indice.ids_alunos)} alunos (fator {args.fator})")
+
+    warnings.simplefilter('ignore', FutureWarning)
+
+    selecoes = [None, 2018, [2015, 2019], [2010, 2024]]
+    print(f"{'seleção':>14} {'atual (ms)':>11} {'passagem única (ms)':>20} {'ganho':>7}")
+    for selecao in selecoes:
+        if json.loads(consolidar_metricas(selecao)) != consolidar_registros(selecao):
+            raise AssertionError(f"Resultados diferentes para a seleção {selecao}")
+
+        atual, _ = medir(lambda: json.loads(consolidar_metricas(selecao)), args.repeticoes)
+        novo, _ = medir(lambda: consolidar_registros(selecao), args.repeticoes)
+        print(f"{str(selecao):>14} {atual * 1000:>11.1f} {novo * 1000:>20.1f} {atual / novo:>6.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""
+Benchmark de inicialização do servidor com e sem o modo preload (PRECARREGAR_DADOS=1).
+
+Para cada modo, sobe o gunicorn com `run:server`, mede o tempo até a primeira resposta
+bem-sucedida e, após aquecer os workers, a memória de cada worker (RSS e PSS, que divide
+as páginas compartilhadas entre os processos que as usam).
+
+Uso:
+> python benchmark_inicializacao.py --workers 4 --url "/v2/visualizacao/tabelas?selecao=2018"
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+
+def filhos(pid):
+    """PIDs dos processos filhos diretos de `pid` (workers do gunicorn)."""
+    pids = []
+    for nome in os.listdir('/proc'):
+        if not nome.isdigit():
+            continue
+        try:
+            with open(f'/proc/{nome}/stat') as arquivo:
+                # O nome do processo (2º campo) pode conter espaços; o ppid vem logo após o ')'
+                campos = arquivo.read().rsplit(')', 1)[1].split()
+        except (FileNotFoundError, ProcessLookupError):
+            continue
+        if int(campos[1]) == pid:
+            pids.append(int(nome))
+    return sorted(pids)
+
+
+def memoria_mb(pid):
+    """RSS e PSS do processo, em MB (lidos de /proc/<pid>/smaps_rollup)."""
+    memoria = {}
+    with open(f'/proc/{pid}/smaps_rollup') as arquivo:
+        for linha in arquivo:
+            partes = linha.split()
+            if partes[0] in ('Rss:', 'Pss:'):
+                memoria[partes[0][:-1]] = int(partes[1]) / 1024
+    return memoria['Rss'], memoria['Pss']
+
+
+def requisitar(url, timeout=120):
+    with urllib.request.urlopen(url, timeout=timeout) as resposta:
+        resposta.read()
+        return resposta.status
+
+
+def medir(preload, workers, porta, caminho, aquecimento, limite):
+    """
+    Sobe o gunicorn em um modo e coleta as medidas.
+
+    :param preload: Se True, define PRECARREGAR_DADOS=1 (dados carregados no master).
+    :param workers: Número de workers do gunicorn.
+    :param porta: Porta local usada pelo servidor.
+    :param caminho: Caminho requisitado (ex.: '/v2/visualizacao/tabelas?selecao=2018').
+    :param aquecimento: Número de requisições feitas antes de medir a memória.
+    :param limite: Tempo máximo, em segundos, aguardando a primeira resposta.
+    :return: Dicionário com o tempo até a primeira resposta e a memória por worker.
+    """
+    env = dict(os.environ, PRECARREGAR_DADOS='1' if preload else '0')
+    # gunicorn 20.0 não tem `python -m gunicorn`; o ponto de entrada é chamado diretamente
+    comando = [
+        sys.executable, '-c', 'from gunicorn.app.wsgiapp import run; run()', 'run:server',
+        '--workers', str(workers),
+        '--bind', f'127.0.0.1:{porta}',
+        '--log-level', 'warning',
+    ]
+    url = f'http://127.0.0.1:{porta}{caminho}'
+
+    inicio = time.perf_counter()
+    servidor = subprocess.Popen(comando, env=env)
+    try:
+        # Tempo até a primeira requisição atendida
+        while True:
+            if servidor.poll() is not None:
+                raise RuntimeError('o gunicorn encerrou antes de responder')
+            if time.perf_counter() - inicio > limite:
+                raise RuntimeError(f'sem resposta em {limite} s')
+            try:
+                if requisitar(url) == 200:
+                    break
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.05)
+        primeira_resposta = time.perf_counter() - inicio
+
+        # Requisições extras para que os workers carreguem o que usam sob demanda
+        for _ in range(aquecimento):
+            requisitar(url)
+
+        memoria = {pid: memoria_mb(pid) for pid in filhos(servidor.pid)}
+        memoria_master = memoria_mb(servidor.pid)
+    finally:
+        servidor.terminate()
+        servidor.wait()
+
+    return {
+        'primeira_resposta': primeira_resposta,
+        'master': memoria_master,
+        'workers': memoria,
+    }
+
+
+def imprimir(nome, resultado):
+    print(f"\n== {nome} ==")
+    print(f"Tempo até a primeira resposta: {resultado['primeira_resposta']:.2f} s")
+    print(f"Master: RSS {resultado['master'][0]:.1f} MB, PSS {resultado['master'][1]:.1f} MB")
+    for pid, (rss, pss) in resultado['workers'].items():
+        print(f"Worker {pid}: RSS {rss:.1f} MB, PSS {pss:.1f} MB")
+
+    pss_total = resultado['master'][1] + sum(pss for _, pss in resultado['workers'].values())
+    print(f"PSS total (master + workers): {pss_total:.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mede tempo até a primeira resposta e memória por worker.')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--porta', type=int, default=8765)
+    parser.add_argument('--url', default='/v2/visualizacao/tabelas?selecao=2018')
+    parser.add_argument('--aquecimento', type=int, default=20,
+                        help='Requisições feitas antes de medir a memória.')
+    parser.add_argument('--limite', type=float, default=300, help='Tempo máximo aguardando o servidor (s).')
+    parser.add_argument('--modo', choices=['ambos', 'preload', 'sem-preload'], default='ambos')
+    args = parser.parse_args()
+
+    modos = {'sem-preload': False, 'preload': True}
+    if args.modo != 'ambos':
+        modos = {args.modo: modos[args.modo]}
+
+    for nome, preload in modos.items():
+        resultado = medir(preload, args.workers, args.porta, args.url, args.aquecimento, args.limite)
+        imprimir(nome, resultado)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Benchmark de memória (soak) das rotas de gráficos do matplotlib.
+
+Faz milhares de requisições a /v2/visualizacao/pizza e /v2/visualizacao/barras no próprio
+processo (cliente de teste do Flask), alternando faixas de anos, e registra o RSS atual
+a cada intervalo. Com as figuras liberadas após o uso, o RSS se estabiliza após o aquecimento.
+
+Uso:
+> python benchmark_memoria.py --requisicoes 2000 --threads 4
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app import server
+
+
+def rss_mb():
+    """RSS atual do processo em MB (lido de /proc/self/statm)."""
+    with open('/proc/self/statm') as arquivo:
+        paginas = int(arquivo.read().split()[1])
+    return paginas * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mede o RSS ao longo de muitas requisições de gráficos.')
+    parser.add_argument('--requisicoes', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--intervalo', type=int, default=200, help='Requisições entre medições de RSS.')
+    parser.add_argument('--anos', type=int, nargs=2, default=[2015, 2020],
+                        help='Anos iniciais das faixas consultadas (faixas de 3 anos).')
+    args = parser.parse_args()
+
+    cliente = server.test_client()
+    urls = [
+        f'/v2/visualizacao/{tipo}?selecao={ano}&selecao2={ano + 3}'
+        for ano in range(args.anos[0], args.anos[1] + 1)
+        for tipo in ('pizza', 'barras')
+    ]
+
+    def requisitar(i):
+        resposta = cliente.get(urls[i % len(urls)])
+        if resposta.status_code != 200:
+            raise RuntimeError(f'{urls[i % len(urls)]}: status {resposta.status_code}')
+
+    # Aquecimento: replays das faixas e caches do matplotlib
+    for i in range(len(urls)):
+        requisitar(i)
+
+    print(f"{'requisições':>12} {'RSS (MB)':>10} {'req/s':>8}")
+    print(f"{0:>12} {rss_mb():>10.1f} {'-':>8}")
+
+    feitas = 0
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        while feitas < args.requisicoes:
+            lote = min(args.intervalo, args.requisicoes - feitas)
+            inicio = time.perf_counter()
+            list(executor.map(requisitar, range(feitas, feitas + lote)))
+            duracao = time.perf_counter() - inicio
+            feitas += lote
+            print(f"{feitas:>12} {rss_mb():>10.1f} {lote / duracao:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
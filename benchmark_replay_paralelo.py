@@ -0,0 +1,69 @@
+"""
+Benchmark do replay do pm4py particionado em processos (REPLAY_PARTICOES) contra o número
+de núcleos da máquina, com o replay vetorizado (REPLAY_MOTOR=numpy) como referência.
+
+As variantes são as mesmas do teste de conformidade de replay_numpy (listar_variantes):
+trajetórias completas e cortadas por cada faixa de anos. Para cada número de partições, o
+pool é criado e aquecido antes da medida (a criação dos processos e a carga da rede em cada
+um são medidas à parte), e os resultados são comparados com os de uma partição.
+
+Uso:
+> python benchmark_replay_paralelo.py --particoes 1 2 4 8 --repeticoes 3
+"""
+import argparse
+import os
+import time
+import warnings
+
+from app.utils import replay_paralelo
+from app.utils.registro import CAMINHO_REDE, obter_df_final, obter_rede, obter_rede_compilada
+from app.utils.replay_numpy import comparar_resultados, listar_variantes
+from benchmark_comum import medir
+
+
+def main():
+    nucleos = os.cpu_count()
+    padrao = sorted({1, 2, 4, nucleos})
+
+    parser = argparse.ArgumentParser(description='Mede o replay do pm4py com REPLAY_PARTICOES partições.')
+    parser.add_argument('--particoes', type=int, nargs='+', default=padrao, help='Valores de REPLAY_PARTICOES.')
+    parser.add_argument('--repeticoes', type=int, default=1)
+    args = parser.parse_args()
+
+    warnings.simplefilter('ignore', FutureWarning)
+
+    net, initial_marking, final_marking = obter_rede()
+    variantes = listar_variantes(obter_df_final())
+    print(f"{len(variantes)} variantes, {nucleos} núcleos, pool iniciado com '{replay_paralelo.METODO_INICIO}'")
+
+    def reproduzir(particoes, amostra=variantes):
+        return replay_paralelo.reproduzir_variantes(
+            amostra, net, initial_marking, final_marking, CAMINHO_REDE, particoes=particoes)
+
+    tempo_numpy, _ = medir(lambda: replay_paralelo.reproduzir_variantes_numpy(variantes, obter_rede_compilada()),
+                           args.repeticoes)
+
+    referencia = None
+    tempo_base = None
+    print(f"{'partições':>9} {'início do pool (s)':>18} {'replay (s)':>11} {'ganho':>7} {'eficiência':>11}")
+    for particoes in args.particoes:
+        # Aquecimento: cria o pool e carrega a rede em cada processo
+        inicio = time.perf_counter()
+        reproduzir(particoes, variantes[:particoes * replay_paralelo.MIN_VARIANTES_POR_PARTICAO])
+        tempo_inicio = time.perf_counter() - inicio if particoes > 1 else 0.0
+
+        tempo, resultados = medir(lambda: reproduzir(particoes), args.repeticoes)
+
+        if referencia is None:
+            referencia, tempo_base = resultados, tempo
+        elif comparar_resultados(referencia, resultados):
+            raise AssertionError(f"Resultados diferentes com {particoes} partições")
+
+        ganho = tempo_base / tempo
+        print(f"{particoes:>9} {tempo_inicio:>18.2f} {tempo:>11.2f} {ganho:>6.2f}x {ganho / particoes:>10.0%}")
+
+    print(f"Referência REPLAY_MOTOR=numpy: {tempo_numpy:.2f} s")
+
+
+if __name__ == '__main__':
+    main()
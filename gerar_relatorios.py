@@ -0,0 +1,170 @@
+"""
+Gera offline os relatórios de todas as turmas: os fluxogramas de métricas (taxa de aprovação,
+gargalo, supressão e trancamento), as visualizações de mineração de processos (fluxograma,
+petrinet, barras e pizza) e uma tabela consolidada em JSON e CSV.
+
+O log, os índices, a rede compilada, o layout do fluxograma e o índice de replay são
+carregados uma única vez no processo principal e herdados pelos processos do pool (fork).
+Cada tarefa é um par (seleção, visualização); as visualizações de uma mesma seleção vão em
+lote para o mesmo processo, que reaproveita o replay da faixa. Os fluxogramas de métricas
+usam o mesmo cache em disco do servidor (app/images/cache).
+
+Seleções: todas as turmas e cada ano de ingresso. Mineração de processos usa a faixa de anos
+dos eventos: o log inteiro para todas as turmas e [ano, ano] para cada ano. Faixas extras
+podem ser informadas com --faixas.
+
+Saída:
+- <saida>/imagens/<seleção>/<visualização>.png
+- <saida>/consolidado.json: versão do log, tabelas (analise_turma e df_consolidado) e imagens por seleção.
+- <saida>/consolidado.csv: df_consolidado de todas as seleções, com a coluna 'Seleção'.
+
+Uso:
+> python gerar_relatorios.py --saida relatorios --processos 4 --faixas 2015-2019 2018-2020
+"""
+import argparse
+import csv
+import gc
+import json
+import multiprocessing
+import os
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+from app.controllers.process_v2 import cache_imagens, calcular_tabelas, chave_imagem_metrica, TIPOS_PROCESS_MINING
+from app.utils.fluxograma import obter_modelo
+from app.utils.new_image_generate import visualizar_disciplinas_por_metrica, TIPOS_METRICA
+from app.utils.process_mining import executar_replay, obter_agregacao_tokens, obter_indice_replay
+from app.utils.registro import carregar_tudo, obter_impressao_log, obter_indice
+
+
+def listar_selecoes(faixas):
+    """
+    Seleções do relatório: (nome, seleção das métricas, faixa de anos da mineração de processos).
+
+    :param faixas: Faixas extras no formato 'AAAA-AAAA'.
+    :return: Lista de tuplas na ordem do relatório.
+    """
+    indice = obter_indice()
+    anos = sorted({int(ano) for ano in indice.ano_ingresso if ano >= 0})
+
+    selecoes = [('todas', None, [int(indice.ano.min()), int(indice.ano.max())])]
+    selecoes += [(str(ano), ano, [ano, ano]) for ano in anos]
+    for faixa in faixas:
+        ano_inicio, ano_fim = (int(ano) for ano in faixa.split('-'))
+        selecoes.append((f'{ano_inicio}-{ano_fim}', [ano_inicio, ano_fim], [ano_inicio, ano_fim]))
+
+    return selecoes
+
+
+def gerar_imagem(tarefa):
+    """
+    Gera e grava a imagem de uma tarefa (executada nos processos do pool).
+
+    :param tarefa: Tupla (diretório de saída, nome da seleção, seleção, faixa, visualização).
+    :return: Dicionário com a seleção, a visualização, o arquivo, o tamanho e o tempo em ms.
+    """
+    saida, nome, selecao, faixa, tipo_visualizacao = tarefa
+    inicio = time.perf_counter()
+
+    if tipo_visualizacao in TIPOS_METRICA:
+        dados = cache_imagens.obter_ou_renderizar(
+            chave_imagem_metrica(tipo_visualizacao, selecao),
+            lambda: visualizar_disciplinas_por_metrica(selecao, tipo_visualizacao),
+        )
+    else:
+        dados = executar_replay(faixa, tipo_visualizacao)
+
+    arquivo = os.path.join('imagens', nome, f'{tipo_visualizacao}.png')
+    os.makedirs(os.path.join(saida, 'imagens', nome), exist_ok=True)
+    with open(os.path.join(saida, arquivo), 'wb') as destino:
+        destino.write(dados)
+
+    return {
+        'selecao': nome,
+        'tipo': tipo_visualizacao,
+        'arquivo': arquivo,
+        'bytes': len(dados),
+        'ms': round((time.perf_counter() - inicio) * 1000, 1),
+    }
+
+
+def escrever_consolidado(saida, selecoes, imagens):
+    """Grava consolidado.json e consolidado.csv com as tabelas de cada seleção."""
+    relatorio = {'versao_log': obter_impressao_log(), 'selecoes': {}}
+    linhas = []
+
+    for nome, selecao, _ in selecoes:
+        faixa = selecao if isinstance(selecao, list) else None
+        ano = selecao if isinstance(selecao, int) else None
+        tabelas = calcular_tabelas(faixa, ano)
+
+        relatorio['selecoes'][nome] = {
+            'analise_turma': tabelas['analise_turma'],
+            'df_consolidado': tabelas['df_consolidado'],
+            'imagens': {imagem['tipo']: imagem['arquivo'] for imagem in imagens if imagem['selecao'] == nome},
+        }
+        linhas += [{'Seleção': nome, **registro} for registro in tabelas['df_consolidado']]
+
+    with open(os.path.join(saida, 'consolidado.json'), 'w', encoding='utf-8') as arquivo:
+        json.dump(relatorio, arquivo, ensure_ascii=False, indent=2)
+
+    with open(os.path.join(saida, 'consolidado.csv'), 'w', encoding='utf-8', newline='') as arquivo:
+        colunas = ['Seleção', 'Código', 'Nome', 'Gargalo', 'Taxa de Aprovação (%)', 'Supressões', 'Trancamentos']
+        escritor = csv.DictWriter(arquivo, fieldnames=colunas)
+        escritor.writeheader()
+        escritor.writerows(linhas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Gera as imagens e tabelas de todas as turmas.')
+    parser.add_argument('--saida', default='relatorios', help='Diretório de saída.')
+    parser.add_argument('--processos', type=int, default=os.cpu_count(), help='Processos do pool.')
+    parser.add_argument('--faixas', nargs='*', default=[], help="Faixas de anos extras, ex.: 2015-2019.")
+    args = parser.parse_args()
+
+    warnings.simplefilter('ignore', FutureWarning)
+
+    # Carga única no processo principal: os processos do pool herdam tudo após o fork
+    inicio = time.perf_counter()
+    carregar_tudo()
+    obter_modelo()
+    obter_indice_replay()
+    obter_agregacao_tokens()
+    gc.collect()
+    gc.freeze()
+    print(f"Dados carregados em {time.perf_counter() - inicio:.2f} s")
+
+    selecoes = listar_selecoes(args.faixas)
+    os.makedirs(args.saida, exist_ok=True)
+
+    # Em ordem de seleção: cada lote leva as visualizações de uma mesma seleção e família
+    tarefas = [
+        (args.saida, nome, selecao, faixa, tipo_visualizacao)
+        for nome, selecao, faixa in selecoes
+        for tipo_visualizacao in TIPOS_METRICA + TIPOS_PROCESS_MINING
+    ]
+
+    contexto = multiprocessing.get_context('fork') if 'fork' in multiprocessing.get_all_start_methods() else None
+
+    inicio = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.processos, mp_context=contexto) as executor:
+        imagens = list(executor.map(gerar_imagem, tarefas, chunksize=len(TIPOS_METRICA)))
+    tempo_imagens = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    escrever_consolidado(args.saida, selecoes, imagens)
+    tempo_tabelas = time.perf_counter() - inicio
+
+    print(f"{len(imagens)} imagens de {len(selecoes)} seleções em {tempo_imagens:.2f} s "
+          f"({len(imagens) / tempo_imagens:.1f} imagens/s, {args.processos} processos)")
+    for familia, tipos in (('Métricas', TIPOS_METRICA), ('Mineração de processos', TIPOS_PROCESS_MINING)):
+        tempos = [imagem['ms'] for imagem in imagens if imagem['tipo'] in tipos]
+        print(f"  {familia}: {len(tempos)} imagens, média de {sum(tempos) / len(tempos):.0f} ms por imagem")
+    print(f"Tabelas consolidadas de {len(selecoes)} seleções em {tempo_tabelas:.2f} s "
+          f"({len(selecoes) / tempo_tabelas:.1f} seleções/s)")
+    print(f"Relatório em {args.saida}")
+
+
+if __name__ == '__main__':
+    main()
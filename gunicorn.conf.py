@@ -0,0 +1,5 @@
+import os
+
+# PRECARREGAR_DADOS=1: o app e os dados (log, índice e rede de Petri) são carregados no
+# master antes do fork, e os workers compartilham essas páginas (copy-on-write)
+preload_app = os.environ.get('PRECARREGAR_DADOS') == '1'
@@ -0,0 +1,25 @@
+"""
+Conformidade do replay vetorizado com o token replay do pm4py nos dados do repositório.
+
+Executar a partir da raiz do repositório (os caminhos do log e da rede são relativos):
+> python -m pytest tests
+"""
+from pm4py.algo.conformance.tokenreplay import algorithm as token_replay
+from pm4py.objects.log.obj import EventLog
+from pm4py.util import variants_util
+
+from app.utils.registro import obter_df_final, obter_rede
+from app.utils.replay_numpy import RedeCompilada, comparar_resultados, listar_variantes, reproduzir_variantes_numpy
+
+
+def test_replay_numpy_igual_ao_pm4py():
+    net, initial_marking, final_marking = obter_rede()
+    variantes = listar_variantes(obter_df_final())
+
+    log = EventLog([variants_util.variant_to_trace(variante) for variante in variantes])
+    esperados = token_replay.apply(log, net, initial_marking, final_marking,
+                                   parameters={token_replay.Variants.TOKEN_REPLAY.value.Parameters.SHOW_PROGRESS_BAR: False})
+    obtidos = reproduzir_variantes_numpy(variantes, RedeCompilada(net, initial_marking, final_marking))
+
+    diferencas = comparar_resultados(esperados, obtidos)
+    assert diferencas == [], [(variantes[i], campo) for i, campo in diferencas[:20]]